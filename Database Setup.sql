@@ -16,9 +16,38 @@ CREATE TABLE IF NOT EXISTS dim_users (
     device_type VARCHAR(50),
     platform VARCHAR(50),
     industry VARCHAR(100),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_signup_date (signup_date)
 );
 
+-- Existing databases: the generator's append mode reads MAX(signup_date) from this index
+-- CREATE INDEX idx_signup_date ON dim_users (signup_date);
+
+-- Event Metadata (every distinct event payload, stored once)
+CREATE TABLE IF NOT EXISTS dim_event_metadata (
+    metadata_id SMALLINT PRIMARY KEY,
+    source VARCHAR(50),
+    plan VARCHAR(50),
+    event VARCHAR(100),
+    feature VARCHAR(100),
+    pql_reason VARCHAR(100),
+    payment_method VARCHAR(50),
+    metadata JSON
+);
+
+-- Fixed dictionary, mirrors EVENT_METADATA in plg_metadata.py
+INSERT IGNORE INTO dim_event_metadata
+    (metadata_id, source, plan, event, feature, pql_reason, payment_method, metadata)
+VALUES
+    (1, 'web', 'free', NULL, NULL, NULL, NULL, '{"source": "web", "plan": "free"}'),
+    (2, NULL, NULL, 'completed_onboarding', NULL, NULL, NULL, '{"event": "completed_onboarding"}'),
+    (3, NULL, NULL, NULL, NULL, 'high_usage_score', NULL, '{"pql_reason": "high_usage_score"}'),
+    (4, NULL, 'pro', NULL, NULL, NULL, 'credit_card', '{"plan": "pro", "payment_method": "credit_card"}'),
+    (5, NULL, NULL, NULL, 'dashboard_view', NULL, NULL, '{"feature": "dashboard_view"}'),
+    (6, NULL, NULL, NULL, 'analytics_report', NULL, NULL, '{"feature": "analytics_report"}'),
+    (7, NULL, NULL, NULL, 'data_export', NULL, NULL, '{"feature": "data_export"}'),
+    (8, NULL, NULL, NULL, 'automation_setup', NULL, NULL, '{"feature": "automation_setup"}');
+
 -- FACT TABLES
 -- User Events (Step-by-step user journey)
 CREATE TABLE IF NOT EXISTS fact_user_events (
@@ -27,11 +56,17 @@ CREATE TABLE IF NOT EXISTS fact_user_events (
     event_type VARCHAR(100),
     event_timestamp DATETIME NOT NULL,
     event_value DECIMAL(10, 2),
-    metadata JSON,
+    metadata_id SMALLINT,
     FOREIGN KEY (user_id) REFERENCES dim_users(user_id),
+    FOREIGN KEY (metadata_id) REFERENCES dim_event_metadata(metadata_id),
     INDEX idx_user_event (user_id, event_timestamp)
 );
 
+-- Existing databases: replace the per-row JSON with dictionary ids
+-- ALTER TABLE fact_user_events ADD COLUMN metadata_id SMALLINT;
+-- UPDATE fact_user_events e JOIN dim_event_metadata m ON e.metadata = m.metadata SET e.metadata_id = m.metadata_id;
+-- ALTER TABLE fact_user_events DROP COLUMN metadata;
+
 -- A/B Test Assignments
 CREATE TABLE IF NOT EXISTS fact_ab_tests (
     ab_test_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -80,40 +80,47 @@ ORDER BY conversion_rate DESC;
 
 
 -- QUERY 4: TIME TO VALUE (TTV) ANALYSIS --
+-- Percentiles are nearest-rank (the value at row FLOOR(p * (n - 1)) in day order);
+-- the EDA report interpolates and breaks them down by cohort and segment (plg_ttv).
 
-SELECT 
-    'Signup to Activation' as journey_stage,
-    ROUND(AVG(c.days_to_activation), 1) as avg_days,
-    ROUND(AVG(c.days_to_activation), 1) as median_days,
-    MIN(c.days_to_activation) as min_days,
-    MAX(c.days_to_activation) as max_days,
-    COUNT(DISTINCT c.user_id) as users_completed
-FROM fact_cohort_data c
-WHERE c.activation_date IS NOT NULL
+WITH ttv AS (
+    SELECT 'Signup to Activation' as journey_stage, 1 as stage_order, c.days_to_activation as days
+    FROM fact_cohort_data c
+    WHERE c.activation_date IS NOT NULL
 
-UNION ALL
+    UNION ALL
 
-SELECT 
-    'Activation to PQL',
-    ROUND(AVG(DATEDIFF(c.pql_date, c.activation_date)), 1),
-    ROUND(AVG(DATEDIFF(c.pql_date, c.activation_date)), 1),
-    MIN(DATEDIFF(c.pql_date, c.activation_date)),
-    MAX(DATEDIFF(c.pql_date, c.activation_date)),
-    COUNT(DISTINCT c.user_id)
-FROM fact_cohort_data c
-WHERE c.pql_date IS NOT NULL AND c.activation_date IS NOT NULL
+    SELECT 'Activation to PQL', 2, DATEDIFF(c.pql_date, c.activation_date)
+    FROM fact_cohort_data c
+    WHERE c.pql_date IS NOT NULL AND c.activation_date IS NOT NULL
 
-UNION ALL
+    UNION ALL
 
+    SELECT 'PQL to Paid', 3, DATEDIFF(c.payment_date, c.pql_date)
+    FROM fact_cohort_data c
+    WHERE c.payment_date IS NOT NULL AND c.pql_date IS NOT NULL
+),
+ranked AS (
+    SELECT 
+        journey_stage,
+        stage_order,
+        days,
+        ROW_NUMBER() OVER (PARTITION BY stage_order ORDER BY days) - 1 as day_rank,
+        COUNT(*) OVER (PARTITION BY stage_order) as users_completed
+    FROM ttv
+)
 SELECT 
-    'PQL to Paid',
-    ROUND(AVG(DATEDIFF(c.payment_date, c.pql_date)), 1),
-    ROUND(AVG(DATEDIFF(c.payment_date, c.pql_date)), 1),
-    MIN(DATEDIFF(c.payment_date, c.pql_date)),
-    MAX(DATEDIFF(c.payment_date, c.pql_date)),
-    COUNT(DISTINCT c.user_id)
-FROM fact_cohort_data c
-WHERE c.payment_date IS NOT NULL AND c.pql_date IS NOT NULL;
+    journey_stage,
+    ROUND(AVG(days), 1) as avg_days,
+    MAX(CASE WHEN day_rank = FLOOR(0.50 * (users_completed - 1)) THEN days END) as median_days,
+    MAX(CASE WHEN day_rank = FLOOR(0.90 * (users_completed - 1)) THEN days END) as p90_days,
+    MAX(CASE WHEN day_rank = FLOOR(0.99 * (users_completed - 1)) THEN days END) as p99_days,
+    MIN(days) as min_days,
+    MAX(days) as max_days,
+    MAX(users_completed) as users_completed
+FROM ranked
+GROUP BY journey_stage, stage_order
+ORDER BY stage_order;
 
 
 -- QUERY 5: COHORT RETENTION ANALYSIS (WEEKLY) --
@@ -159,20 +166,43 @@ WITH test_stats AS (
         ROUND(100.0 * SUM(CASE WHEN converted = 1 THEN 1 ELSE 0 END) / COUNT(DISTINCT user_id), 2) as success_rate
     FROM fact_ab_tests
     GROUP BY test_name, variant
+),
+arms AS (
+    SELECT 
+        test_name,
+        MAX(CASE WHEN variant LIKE 'control%' THEN success_rate END) as control_rate,
+        MAX(CASE WHEN variant NOT LIKE 'control%' THEN success_rate END) as treatment_rate,
+        SUM(CASE WHEN variant LIKE 'control%' THEN sample_size END) as control_size,
+        SUM(CASE WHEN variant LIKE 'control%' THEN successes END) as control_successes,
+        SUM(CASE WHEN variant NOT LIKE 'control%' THEN sample_size END) as treatment_size,
+        SUM(CASE WHEN variant NOT LIKE 'control%' THEN successes END) as treatment_successes
+    FROM test_stats
+    GROUP BY test_name
+),
+z_scores AS (
+    -- Pooled two-proportion z-test (treatment arms combined vs control)
+    SELECT 
+        arms.*,
+        (1.0 * treatment_successes / treatment_size - 1.0 * control_successes / control_size) /
+        SQRT((1.0 * (control_successes + treatment_successes) / (control_size + treatment_size)) *
+             (1 - 1.0 * (control_successes + treatment_successes) / (control_size + treatment_size)) *
+             (1.0 / control_size + 1.0 / treatment_size)) as z_score
+    FROM arms
 )
 SELECT 
     test_name,
-    MAX(CASE WHEN variant LIKE 'control%' THEN success_rate END) as control_rate,
-    MAX(CASE WHEN variant NOT LIKE 'control%' THEN success_rate END) as treatment_rate,
-    ROUND(MAX(CASE WHEN variant NOT LIKE 'control%' THEN success_rate END) - 
-          MAX(CASE WHEN variant LIKE 'control%' THEN success_rate END), 2) as lift_percentage,
+    control_rate,
+    treatment_rate,
+    ROUND(treatment_rate - control_rate, 2) as lift_percentage,
+    ROUND(z_score, 2) as z_score,
     CASE 
-        WHEN ABS(MAX(CASE WHEN variant NOT LIKE 'control%' THEN success_rate END) - 
-                 MAX(CASE WHEN variant LIKE 'control%' THEN success_rate END)) > 5 THEN '✅ Significant'
+        WHEN ABS(z_score) > 1.96 THEN '✅ Significant (p < 0.05)'
         ELSE '⚠️ Inconclusive'
     END as significance
-FROM test_stats
-GROUP BY test_name;
+FROM z_scores;
+
+-- Multi-arm tests, confidence intervals, multiple-comparison correction and
+-- sequential looks: see analyze_ab_tests (plg_abstats) in the EDA report.
 
 
 -- QUERY 8: PQL IDENTIFICATION - CHARACTERISTICS --
@@ -225,4 +255,22 @@ SELECT
 FROM fact_cohort_data c
 LEFT JOIN fact_user_events e ON c.user_id = e.user_id
 GROUP BY c.cohort_date
-ORDER BY c.cohort_date DESC;
\ No newline at end of file
+ORDER BY c.cohort_date DESC;
+
+-- QUERY 11: FEATURE ADOPTION - PQL CONVERSION BY FEATURE --
+-- Features come from dim_event_metadata through each event's metadata_id
+
+SELECT 
+    m.feature,
+    COUNT(DISTINCT e.user_id) as adopters,
+    COUNT(*) as sessions,
+    ROUND(100.0 * COUNT(DISTINCT CASE WHEN c.pql_date IS NOT NULL THEN e.user_id END) / 
+          COUNT(DISTINCT e.user_id), 2) as pql_rate,
+    ROUND(100.0 * COUNT(DISTINCT CASE WHEN c.payment_date IS NOT NULL THEN e.user_id END) / 
+          COUNT(DISTINCT e.user_id), 2) as paid_rate
+FROM fact_user_events e
+JOIN dim_event_metadata m ON e.metadata_id = m.metadata_id
+LEFT JOIN fact_cohort_data c ON e.user_id = c.user_id
+WHERE e.event_type = 'feature_use'
+GROUP BY m.feature
+ORDER BY pql_rate DESC;
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+
+# Each command imports its modules only when it runs: `stats` never loads
+# pandas, scipy or Faker, and `report --only funnel` never loads scipy.
+# MySQL settings come from PLG_DB_* environment variables or plg.ini (plg_db).
+COMMANDS = {
+    'generate': "generate sample data (plg_data_generator options, e.g. --sink sqlite --users 10000)",
+    'report': "write the EDA report (PLG_Analytics_EDA_v2 options, e.g. --only funnel)",
+    'stats': "print table row counts and funnel metrics of the database"
+}
+
+def run_generate(argv):
+    from plg_data_generator import main
+    main(argv)
+
+def run_report(argv):
+    from PLG_Analytics_EDA_v2 import main
+    main(argv)
+
+def run_stats(argv):
+    parser = argparse.ArgumentParser(prog='plg.py stats', description=COMMANDS['stats'])
+    parser.add_argument('--backend', default='mysql', choices=['mysql', 'sqlite', 'duckdb'],
+                        help="read MySQL or the generator's embedded database")
+    parser.add_argument('--db-path', default='plg_analytics.db', help="embedded database file")
+    args = parser.parse_args(argv)
+
+    from plg_db import connect, print_statistics
+    if args.backend != 'mysql' and not os.path.exists(args.db_path):
+        print(f"❌ No {args.backend} database at {args.db_path}")
+        sys.exit(1)
+    try:
+        connection = connect(args.backend, args.db_path)
+    except Exception as e:
+        print(f"❌ Error connecting to {args.backend}: {e}")
+        sys.exit(1)
+    try:
+        print_statistics(connection)
+    finally:
+        connection.close()
+
+def main(argv=None):
+    commands = "\n".join(f"  {name:<10}{description}" for name, description in COMMANDS.items())
+    parser = argparse.ArgumentParser(prog='plg.py', description=f"PLG analytics command line\n\ncommands:\n{commands}",
+                                     epilog="Run 'plg.py COMMAND --help' for the options of a command.",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, help="command to run")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    {'generate': run_generate, 'report': run_report, 'stats': run_stats}[args.command](args.args)
+
+if __name__ == "__main__":
+    main()
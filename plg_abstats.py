@@ -0,0 +1,220 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+ALPHA = 0.05
+BOOTSTRAP_SAMPLES = 2000
+BOOTSTRAP_SEED = 42
+CORRECTIONS = ['holm', 'bonferroni', 'fdr_bh', 'none']
+
+# scipy.stats is imported by the functions that use it: it is the slowest import
+# of the report, and the aggregates only need variant_counts / look_counts
+
+def variant_counts(ab_tests):
+    """Users per (test_name, variant, converted) from fact_ab_tests rows"""
+    counts = ab_tests.groupby(['test_name', 'variant', 'converted'], observed=True).size()
+    return counts.rename('users').reset_index()
+
+def look_counts(ab_tests):
+    """Users per (test_name, variant, assignment day, conversion day) for sequential_looks"""
+    days = pd.DataFrame({
+        'test_name': ab_tests['test_name'],
+        'variant': ab_tests['variant'],
+        'assigned_on': pd.to_datetime(ab_tests['test_start_date']).dt.floor('D'),
+        'converted_on': pd.to_datetime(ab_tests['conversion_timestamp']).dt.floor('D')
+    })
+    looks = days.groupby(list(days.columns), observed=True, dropna=False).size()
+    return looks.rename('users').reset_index()
+
+def variant_stats(counts, alpha=ALPHA):
+    """Users, conversions, rate and Wilson interval per (test_name, variant)
+
+    counts has one row per (test_name, variant, converted) with a users
+    column - one groupby over the assignments, or a pushed-down query.
+    """
+    from scipy import stats
+    counts = counts.assign(conversions=counts['users'] * (counts['converted'] == 1))
+    grouped = counts.groupby(['test_name', 'variant'], observed=True)[['users', 'conversions']].sum()
+    grouped.index = grouped.index.set_levels([level.astype(str) for level in grouped.index.levels])
+
+    n = grouped['users'].to_numpy(dtype=float)
+    rate = np.divide(grouped['conversions'].to_numpy(dtype=float), n, out=np.zeros_like(n), where=n > 0)
+    z = stats.norm.ppf(1 - alpha / 2)
+
+    # Wilson score interval: well-behaved near 0% / 100% and for small arms
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = 1 + z**2 / n
+        center = (rate + z**2 / (2 * n)) / denominator
+        half_width = z * np.sqrt(rate * (1 - rate) / n + z**2 / (4 * n**2)) / denominator
+
+    grouped['rate'] = rate
+    grouped['wilson_low'] = center - half_width
+    grouped['wilson_high'] = center + half_width
+    grouped['is_control'] = grouped.index.get_level_values('variant').str.contains('control', case=False)
+    return grouped
+
+def chi_square_tests(variants):
+    """Chi-square test of independence (variant x converted) for every test at once
+
+    Matches scipy.stats.chi2_contingency, including Yates' continuity
+    correction for 2x2 tables.
+    """
+    from scipy import stats
+    tests = variants.index.get_level_values('test_name')
+    observed = np.column_stack([variants['conversions'], variants['users'] - variants['conversions']]).astype(float)
+
+    row_totals = observed.sum(axis=1)
+    column_totals = pd.DataFrame(observed).groupby(tests).transform('sum').to_numpy()
+    grand_totals = pd.Series(row_totals).groupby(tests).transform('sum').to_numpy()
+    expected = row_totals[:, None] * column_totals / grand_totals[:, None]
+
+    arms = pd.Series(1, index=tests).groupby(level=0).transform('sum').to_numpy()
+    dof = arms - 1
+    difference = expected - observed
+    corrected = observed + np.where(dof[:, None] == 1, np.sign(difference) * np.minimum(0.5, np.abs(difference)), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cells = np.where(expected > 0, (corrected - expected)**2 / expected, np.nan)
+
+    result = pd.DataFrame({'chi2': cells.sum(axis=1), 'dof': dof}, index=tests).groupby(level=0).agg(
+        chi2=('chi2', 'sum'), dof=('dof', 'first'))
+    result['p_value'] = stats.chi2.sf(result['chi2'], result['dof'])
+    return result
+
+def adjust_p_values(p_values, method='holm'):
+    """Multiple-comparison adjusted p-values (Holm, Bonferroni or Benjamini-Hochberg)"""
+    p = np.asarray(p_values, dtype=float)
+    m = len(p)
+    if method == 'none' or m == 0:
+        return p
+    if method == 'bonferroni':
+        return np.minimum(p * m, 1)
+
+    order = np.argsort(p)
+    adjusted = np.empty(m)
+    if method == 'holm':
+        adjusted[order] = np.minimum(np.maximum.accumulate(p[order] * (m - np.arange(m))), 1)
+    elif method == 'fdr_bh':
+        scaled = p[order] * m / np.arange(1, m + 1)
+        adjusted[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1)
+    else:
+        raise ValueError(f"Unknown correction: {method}")
+    return adjusted
+
+def arm_comparisons(variants, alpha=ALPHA, correction='holm', samples=BOOTSTRAP_SAMPLES, seed=BOOTSTRAP_SEED):
+    """Every treatment arm against its test's control, all tests at once
+
+    Two-proportion z-tests, multiple-comparison adjusted p-values, and
+    percentile bootstrap CIs for the relative lift. Bootstrap draws are
+    binomial resamples of both arms, one (samples x comparisons) batch.
+    """
+    from scipy import stats
+    controls = variants[variants['is_control']].reset_index('variant').groupby(level='test_name').head(1)
+    arms = variants[~variants['is_control']]
+    arms = arms[arms.index.get_level_values('test_name').isin(controls.index)]
+    control = controls.loc[arms.index.get_level_values('test_name')]
+
+    n_t, x_t = arms['users'].to_numpy(float), arms['conversions'].to_numpy(float)
+    n_c, x_c = control['users'].to_numpy(float), control['conversions'].to_numpy(float)
+    p_t, p_c = arms['rate'].to_numpy(), control['rate'].to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = (x_t + x_c) / (n_t + n_c)
+        z = (p_t - p_c) / np.sqrt(pooled * (1 - pooled) * (1 / n_t + 1 / n_c))
+        lift = (p_t - p_c) / p_c
+
+        rng = np.random.default_rng(seed)
+        treatment_draws = rng.binomial(n_t.astype(np.int64), p_t, size=(samples, len(arms))) / n_t
+        control_draws = rng.binomial(n_c.astype(np.int64), p_c, size=(samples, len(arms))) / n_c
+        lifts = (treatment_draws - control_draws) / control_draws
+    lifts[~np.isfinite(lifts)] = np.nan
+    with warnings.catch_warnings():
+        # A control arm with no conversions has no defined lift
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lift_low, lift_high = np.nanpercentile(lifts, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+    p_values = 2 * stats.norm.sf(np.abs(np.nan_to_num(z)))
+    comparisons = pd.DataFrame({
+        'control': control['variant'].to_numpy(),
+        'control_rate': p_c,
+        'rate': p_t,
+        'lift': lift,
+        'lift_low': lift_low,
+        'lift_high': lift_high,
+        'z': z,
+        'p_value': p_values,
+        'p_adjusted': adjust_p_values(p_values, correction)
+    }, index=arms.index)
+    comparisons['significant'] = comparisons['p_adjusted'] < alpha
+    return comparisons
+
+def spending_boundaries(looks, alpha=ALPHA):
+    """Per-look z boundaries from O'Brien-Fleming-type alpha spending
+
+    Each look gets the alpha spent since the previous one (Lan-DeMets
+    spending function), tested on its own - a conservative bound that keeps
+    the overall false-positive rate at or below alpha across all looks.
+    """
+    from scipy import stats
+    information = np.arange(1, looks + 1) / looks
+    spent = 2 * stats.norm.sf(stats.norm.ppf(1 - alpha / 2) / np.sqrt(information))
+    increments = np.diff(np.concatenate([[0], spent]))
+    return stats.norm.isf(increments / 2)
+
+def sequential_looks(assignments, looks=6, alpha=ALPHA):
+    """Repeated looks over each test's timeline, on conversion_timestamp
+
+    assignments has test_name, variant, assigned_on (test_start_date),
+    converted_on (conversion_timestamp, missing if never converted) and a
+    users count - raw rows with users=1 or pre-aggregated by day.
+
+    Look k happens k/looks of the way from the first assignment to the last
+    conversion. At each look only users assigned by then, and conversions
+    made by then, count. Returns per-arm z at each look with the first look
+    whose alpha-spending boundary was crossed (0 = never), and the boundaries.
+    """
+    df = pd.DataFrame({
+        'test_name': assignments['test_name'].astype(str).to_numpy(),
+        'variant': assignments['variant'].astype(str).to_numpy(),
+        'assigned_on': pd.to_datetime(assignments['assigned_on']).to_numpy(),
+        'converted_on': pd.to_datetime(assignments['converted_on']).to_numpy(),
+        'users': assignments['users'].to_numpy(np.int64)
+    })
+    tests = df.groupby('test_name')
+    first = tests['assigned_on'].transform('min').to_numpy()
+    last = tests['converted_on'].transform('max').fillna(tests['assigned_on'].transform('max')).to_numpy()
+    span = np.maximum((last - first) / np.timedelta64(1, 's'), 1)
+
+    def look_index(timestamps):
+        fraction = (timestamps - first) / np.timedelta64(1, 's') / span
+        index = np.clip(np.ceil(np.nan_to_num(fraction * looks)), 1, looks)
+        return np.where(np.isnan(fraction), looks + 1, index).astype(np.int64)
+
+    df['assigned_look'] = look_index(df['assigned_on'].to_numpy())
+    df['converted_look'] = look_index(df['converted_on'].to_numpy())
+
+    # Cumulative users and conversions per (test, variant) at every look
+    keys = ['test_name', 'variant']
+    look_columns = range(1, looks + 1)
+    assigned = df.groupby(keys + ['assigned_look'])['users'].sum().unstack(fill_value=0).reindex(
+        columns=look_columns, fill_value=0).cumsum(axis=1)
+    converted = df.groupby(keys + ['converted_look'])['users'].sum().unstack(fill_value=0).reindex(
+        columns=look_columns, fill_value=0).cumsum(axis=1).reindex(assigned.index, fill_value=0)
+
+    is_control = assigned.index.get_level_values('variant').str.contains('control', case=False)
+    test_names = assigned.index.get_level_values('test_name')
+    control_rows = pd.Series(np.arange(len(assigned)))[is_control].groupby(test_names[is_control]).first()
+    arm_rows = np.flatnonzero(~is_control & test_names.isin(control_rows.index))
+    matched = control_rows.loc[test_names[arm_rows]].to_numpy()
+
+    n, x = assigned.to_numpy(float), converted.to_numpy(float)
+    n_t, x_t, n_c, x_c = n[arm_rows], x[arm_rows], n[matched], x[matched]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = (x_t + x_c) / (n_t + n_c)
+        z = (x_t / n_t - x_c / n_c) / np.sqrt(pooled * (1 - pooled) * (1 / n_t + 1 / n_c))
+    z = np.nan_to_num(z)
+
+    boundaries = spending_boundaries(looks, alpha)
+    crossed = np.abs(z) >= boundaries
+    result = pd.DataFrame(z, index=assigned.index[arm_rows], columns=[f"z{look}" for look in look_columns])
+    result['stopped_at'] = np.where(crossed.any(axis=1), crossed.argmax(axis=1) + 1, 0)
+    return result, boundaries
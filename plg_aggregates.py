@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from plg_abstats import look_counts, variant_counts
+from plg_cohorts import (MILESTONES, NEVER, active_periods, milestone_days, milestones_frame, retention_from_periods,
+                         summarize_cohorts)
+from plg_features import feature_bitmask, feature_cells, feature_sessions
+from plg_funnel import FUNNEL_DIMENSIONS, STAGE_BITS, funnel_breakdown, stage_bitmask
+from plg_metadata import FEATURES
+from plg_snapshot import append_rows, read_arrow, write_arrow
+from plg_ttv import ttv_counts
+
+STATE_DIR = 'plg_state'
+STATE_MANIFEST = 'state.json'
+# ReportState attributes saved as Arrow files (the per-user arrays go to one .npz)
+STATE_FRAMES = ['users', 'ab_counts', 'ab_looks']
+
+# Columns folded into the state per source table, in fold order: users come
+# first so every event and assignment finds its user
+FOLD_COLUMNS = {
+    'dim_users': ['user_id', 'signup_date'] + FUNNEL_DIMENSIONS,
+    'fact_user_events': ['user_id', 'event_type', 'event_timestamp', 'event_value', 'metadata_id'],
+    'fact_ab_tests': ['test_name', 'variant', 'converted', 'test_start_date', 'conversion_timestamp']
+}
+AB_COUNT_KEYS = ['test_name', 'variant', 'converted']
+AB_LOOK_KEYS = ['test_name', 'variant', 'assigned_on', 'converted_on']
+
+def merge_counts(left, right, keys):
+    """Sum two users-count frames over their key columns"""
+    right = right.astype({'test_name': str, 'variant': str})
+    if 'converted' in keys:
+        right = right.astype({'converted': np.int64})
+    combined = right if left is None else pd.concat([left, right], ignore_index=True)
+    return combined.groupby(keys, dropna=False)['users'].sum().reset_index()
+
+def diff_results(left, right):
+    """Names of the ReportState results that differ between two states"""
+    differing = []
+    for name, df in left.items():
+        try:
+            pd.testing.assert_frame_equal(df, right[name], check_dtype=False, check_categorical=False)
+        except AssertionError:
+            differing.append(name)
+    return differing
+
+class ReportState:
+    """Mergeable aggregates the EDA report can be rendered from
+
+    Per user: funnel stage and features-used bitmasks (OR), first milestone
+    days (minimum) and active retention periods (OR). In total: payment
+    count and revenue, feature sessions and A/B counts (sum). Folding rows in any batches - only the rows past a
+    watermark, or chunks of one scan - gives the same state as folding the
+    whole table at once.
+    """
+
+    def __init__(self, granularity='week', periods=8, source=None):
+        self.settings = {'granularity': granularity, 'periods': periods}
+        # Database the rows were folded from (plg_db.source_identity)
+        self.source = source
+        self.users = None
+        self.stages = np.zeros(0, dtype=np.uint8)
+        self.first_days = np.zeros((0, len(MILESTONES)), dtype=np.int64)
+        self.active = np.zeros(0, dtype=np.uint64)
+        self.features = np.zeros(0, dtype=np.uint8)
+        self.revenue = {'customers': 0, 'revenue': 0.0}
+        self.feature_sessions = {feature: 0 for feature in FEATURES}
+        self.ab_counts = None
+        self.ab_looks = None
+        # Source table -> fingerprint ({'rows', 'max_key'}) of the rows folded so far
+        self.watermarks = {table: None for table in FOLD_COLUMNS}
+
+    def fold(self, table, rows):
+        """Fold a batch of rows of one source table"""
+        {'dim_users': self.add_users, 'fact_user_events': self.add_events,
+         'fact_ab_tests': self.add_ab_tests}[table](rows)
+
+    def add_users(self, users):
+        users = users.reset_index(drop=True)
+        self.users = users if self.users is None else append_rows(self.users, users)
+        self.stages = np.concatenate([self.stages, np.full(len(users), STAGE_BITS['signup'], dtype=np.uint8)])
+        self.first_days = np.concatenate([self.first_days,
+                                          np.full((len(users), len(MILESTONES)), NEVER, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(len(users), dtype=np.uint64)])
+        self.features = np.concatenate([self.features, np.zeros(len(users), dtype=np.uint8)])
+
+    def add_events(self, events):
+        payments = events.loc[events['event_type'] == 'payment_complete', 'event_value']
+        self.revenue['customers'] += len(payments)
+        self.revenue['revenue'] += float(payments.sum())
+        for feature, sessions in feature_sessions(events).itertuples(index=False):
+            self.feature_sessions[feature] += int(sessions)
+        if self.users is None or not len(events):
+            return
+        # In place: a batch costs its own rows, not another copy of the per-user state
+        stage_bitmask(self.users, events, out=self.stages)
+        milestone_days(self.users, events, out=self.first_days)
+        active_periods(self.users, events, self.settings['granularity'], self.settings['periods'], out=self.active)
+        feature_bitmask(self.users, events, out=self.features)
+
+    def add_ab_tests(self, ab_tests):
+        self.ab_counts = merge_counts(self.ab_counts, variant_counts(ab_tests), AB_COUNT_KEYS)
+        self.ab_looks = merge_counts(self.ab_looks, look_counts(ab_tests), AB_LOOK_KEYS)
+
+    def memory_usage(self):
+        """Bytes held by the state"""
+        arrays = self.stages.nbytes + self.first_days.nbytes + self.active.nbytes + self.features.nbytes
+        return arrays + sum(int(getattr(self, name).memory_usage(deep=True).sum()) for name in STATE_FRAMES
+                            if getattr(self, name) is not None)
+
+    def results(self):
+        """dfs entries the analyses run from, shaped like the pushed-down results"""
+        granularity, periods = self.settings['granularity'], self.settings['periods']
+        milestones = milestones_frame(self.users, self.first_days)
+        summary = summarize_cohorts(milestones, granularity)
+        retention = retention_from_periods(self.users['signup_date'], self.active, granularity, periods)
+        return {
+            'funnel_cells': funnel_breakdown(self.users, self.stages, FUNNEL_DIMENSIONS).reset_index(),
+            'ab_test_counts': self.ab_counts,
+            'ab_test_looks': self.ab_looks,
+            'revenue_totals': pd.DataFrame([self.revenue]),
+            'cohort_summary': summary.reset_index(),
+            # Arrow needs string column names: 'Users', '0', '1', ...
+            'cohort_retention': retention.rename(columns=str).reset_index(),
+            'ttv_counts': ttv_counts(milestones.assign(user_segment=self.users['user_segment'].to_numpy()),
+                                     granularity),
+            'feature_cells': feature_cells(self.features, self.stages),
+            'feature_sessions': pd.DataFrame(list(self.feature_sessions.items()), columns=['feature', 'sessions'])
+        }
+
+    def save(self, state_dir=STATE_DIR):
+        """Write the state to a new generation directory, then point the manifest at it
+
+        A run interrupted while saving leaves the previous generation in use,
+        so additive counts are never folded twice.
+        """
+        manifest = read_manifest(state_dir)
+        generation = manifest['generation'] + 1 if manifest else 1
+        path = os.path.join(state_dir, f"generation_{generation}")
+        os.makedirs(path, exist_ok=True)
+
+        for name in STATE_FRAMES:
+            if getattr(self, name) is not None:
+                write_arrow(getattr(self, name), os.path.join(path, f"{name}.arrow"))
+        np.savez(os.path.join(path, 'user_state.npz'), stages=self.stages, first_days=self.first_days,
+                 active=self.active, features=self.features)
+
+        manifest_path = os.path.join(state_dir, STATE_MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'generation': generation, 'settings': self.settings, 'source': self.source,
+                       'revenue': self.revenue,
+                       'feature_sessions': self.feature_sessions, 'watermarks': self.watermarks}, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        if manifest:
+            shutil.rmtree(os.path.join(state_dir, f"generation_{manifest['generation']}"), ignore_errors=True)
+
+    @classmethod
+    def load(cls, state_dir=STATE_DIR):
+        """The saved state, or None if there is none (or it predates the feature aggregates)"""
+        manifest = read_manifest(state_dir)
+        if not manifest or 'feature_sessions' not in manifest:
+            return None
+        path = os.path.join(state_dir, f"generation_{manifest['generation']}")
+        state = cls(**manifest['settings'], source=manifest.get('source'))
+        for name in STATE_FRAMES:
+            if os.path.exists(os.path.join(path, f"{name}.arrow")):
+                setattr(state, name, read_arrow(os.path.join(path, f"{name}.arrow")))
+        with np.load(os.path.join(path, 'user_state.npz')) as arrays:
+            state.stages, state.first_days, state.active = arrays['stages'], arrays['first_days'], arrays['active']
+            state.features = arrays['features']
+        state.revenue = manifest['revenue']
+        state.feature_sessions = manifest['feature_sessions']
+        state.watermarks = manifest['watermarks']
+        return state
+
+def read_manifest(state_dir):
+    manifest_path = os.path.join(state_dir, STATE_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
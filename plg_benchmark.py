@@ -0,0 +1,460 @@
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from plg_trace import peak_rss, span, start_tracing, write_trace
+
+# Dataset sizes by name; every size is generated into its own embedded database
+BENCHMARK_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+BENCHMARK_DIR = 'plg_benchmark'
+HISTORY_FILE = 'history.jsonl'
+
+# The first mode is timed per analysis and is the reference the others must match
+BENCHMARK_MODES = ['memory', 'pushdown', 'chunked']
+
+# Relative tolerance for comparing results between execution modes and reference implementations
+TOLERANCE = 1e-9
+
+# plg.py commands timed by --startup: (label, arguments). {backend} / {db} are the
+# benchmark database, {scratch} a fresh database file for every generate run.
+PLG_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plg.py')
+STARTUP_COMMANDS = [
+    ('--help', ['--help']),
+    ('stats', ['stats', '--backend', '{backend}', '--db-path', '{db}']),
+    ('report --only funnel', ['report', '--only', 'funnel', '--backend', '{backend}', '--db-path', '{db}',
+                              '--no-cache', '--quiet']),
+    ('report', ['report', '--backend', '{backend}', '--db-path', '{db}', '--no-cache', '--quiet']),
+    ('generate', ['generate', '--sink', '{backend}', '--db-path', '{scratch}', '--users', '1000'])
+]
+# Packages whose import dominates start-up; --startup lists the ones each command loads
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'faker', 'mysql', 'pyarrow', 'duckdb']
+STARTUP_REPEATS = 5
+
+# ==========================================
+# 1. TIMED STAGES
+# ==========================================
+
+class StageTimer:
+    """Times named stages and collects their throughput and memory
+
+    Each stage runs inside a trace span, so the wall time, process RSS and
+    peak RSS (and tracemalloc peaks with --trace-memory) come from plg_trace.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        """Time a block; the caller may set fields['rows'] (and 'bytes') for throughput"""
+        start = time.perf_counter()
+        with span(name, **fields) as recorded:
+            yield recorded
+        seconds = time.perf_counter() - start
+        result = {'stage': name, 'seconds': round(seconds, 4)}
+        for key in ['rows', 'bytes', 'rss_mb', 'peak_rss_mb', 'alloc_peak_mb']:
+            if key in recorded:
+                result[key] = recorded[key]
+        if recorded.get('rows') and seconds > 0:
+            result['rows_per_s'] = round(recorded['rows'] / seconds)
+        self.stages.append(result)
+
+def table_rows(connection, table):
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    rows = int(cursor.fetchone()[0])
+    cursor.close()
+    return rows
+
+def remove_database(path):
+    """Delete an embedded database file and its WAL / shared-memory companions"""
+    for suffix in ['', '-wal', '-shm', '.wal']:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def generate(timer, path, backend, num_users, profile, streaming=False):
+    """Generate the dataset into a fresh embedded database, one timed stage per generate_* function"""
+    import plg_data_generator as generator
+    from plg_sinks import TABLES, open_sink
+
+    remove_database(path)
+    sink = open_sink(backend, path=path)
+    try:
+        if streaming:
+            with timer.stage('generate_dataset') as fields:
+                counts = generator.generate_dataset(sink, num_users=num_users, profile=profile)
+                fields['rows'] = sum(counts.values())
+            return
+        with timer.stage('generate_users') as fields:
+            users = generator.generate_users(sink, num_users=num_users, profile=profile)
+            fields['rows'] = len(users['user_id'])
+        with timer.stage('generate_user_events') as fields:
+            milestones = generator.generate_user_events(sink, users, profile=profile)
+            fields['rows'] = table_rows(sink.connection, TABLES[1])
+        with timer.stage('generate_ab_tests') as fields:
+            generator.generate_ab_tests(sink, users, profile=profile)
+            fields['rows'] = table_rows(sink.connection, TABLES[2])
+        with timer.stage('generate_cohort_data') as fields:
+            generator.generate_cohort_data(sink, milestones)
+            fields['rows'] = table_rows(sink.connection, TABLES[3])
+    finally:
+        sink.close()
+
+def run_analyses(timer, eda, dfs, mode, per_analysis):
+    """Run every analysis on dfs, timing each one (per_analysis) or all together"""
+    sections = {}
+    if not per_analysis:
+        with timer.stage(f"analyses[{mode}]"):
+            for analysis in eda.ANALYSES:
+                sections.update(analysis(dfs))
+        return sections
+
+    for analysis in eda.ANALYSES:
+        with timer.stage(analysis.__name__) as fields:
+            sections.update(analysis(dfs))
+            # Throughput over the raw input rows when the analysis read them
+            fields['rows'] = sum(len(dfs[name]) for name in analysis.columns if name in dfs)
+    return sections
+
+def load(timer, eda, connection, mode, state_dir):
+    """Load the analysis inputs for one execution mode"""
+    name = 'load_data' if mode == 'memory' else f"load_inputs[{mode}]"
+    with timer.stage(name) as fields:
+        if mode == 'memory':
+            dfs = eda.load_data(connection)
+        else:
+            dfs = eda.load_inputs(connection, mode, state_dir=state_dir)
+        fields['rows'] = sum(len(df) for df in dfs.values())
+        fields['bytes'] = int(sum(df.memory_usage(deep=True).sum() for df in dfs.values()))
+    return dfs
+
+# ==========================================
+# 2. CORRECTNESS CHECKS
+# ==========================================
+
+def compare_tables(expected, actual):
+    """Names of the result tables that differ beyond TOLERANCE"""
+    import pandas as pd
+    differing = []
+    for name, df in expected.items():
+        try:
+            pd.testing.assert_frame_equal(df, actual[name], check_dtype=False, check_categorical=False,
+                                          check_index_type=False, check_column_type=False, rtol=TOLERANCE)
+        except (AssertionError, KeyError):
+            differing.append(name)
+    return differing
+
+def reference_checks(connection, tables):
+    """Check the report numbers against straightforward implementations over the raw tables
+
+    Funnel stages against COUNT(DISTINCT user_id) per event type, revenue
+    against SUM(event_value), the vectorized chi-square tests against
+    scipy.stats.chi2_contingency run test by test, and TTV percentiles
+    against np.quantile over the generator's fact_cohort_data days.
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import stats
+    from plg_funnel import FUNNEL_STAGES
+    from plg_ttv import TTV_QUANTILES, quantile_columns
+
+    checks = {}
+    stage_users = pd.read_sql("SELECT event_type, COUNT(DISTINCT user_id) AS users FROM fact_user_events "
+                              "GROUP BY event_type", connection).set_index('event_type')['users']
+    stage_users['signup'] = table_rows(connection, 'dim_users')
+    expected = [int(stage_users.get(event_type, 0)) for _, event_type in FUNNEL_STAGES]
+    checks['funnel_vs_sql'] = expected == tables['funnel_waterfall']['users'].astype(int).tolist()
+
+    payments = pd.read_sql("SELECT COUNT(*) AS customers, SUM(event_value) AS revenue FROM fact_user_events "
+                           "WHERE event_type = 'payment_complete'", connection).iloc[0]
+    summary = tables['revenue_summary'].iloc[0]
+    checks['revenue_vs_sql'] = (int(payments['customers']) == int(summary['customers'])
+                                and math.isclose(float(payments['revenue'] or 0), summary['revenue'],
+                                                 rel_tol=TOLERANCE))
+
+    counts = pd.read_sql("SELECT test_name, variant, converted, COUNT(*) AS users FROM fact_ab_tests "
+                         "GROUP BY test_name, variant, converted", connection)
+    chi_square = tables['ab_chi_square']
+    matches = []
+    for test_name, test in counts.groupby('test_name'):
+        observed = test.pivot_table(index='variant', columns='converted', values='users', fill_value=0)
+        chi2, p_value, _, _ = stats.chi2_contingency(observed.to_numpy())
+        row = chi_square.loc[test_name]
+        matches.append(np.isclose(chi2, row['chi2'], rtol=TOLERANCE)
+                       and np.isclose(p_value, row['p_value'], rtol=TOLERANCE))
+    checks['chi_square_vs_scipy'] = bool(matches) and all(matches)
+
+    cohort = pd.read_sql("SELECT days_to_activation, days_to_pql, days_to_payment FROM fact_cohort_data",
+                         connection).astype(float)
+    steps = {
+        'Signup to Activation': cohort['days_to_activation'],
+        'Activation to PQL': cohort['days_to_pql'] - cohort['days_to_activation'],
+        'PQL to Paid': cohort['days_to_payment'] - cohort['days_to_pql']
+    }
+    overall = tables['ttv_overall']
+    checks['ttv_vs_numpy'] = all(
+        np.allclose(np.quantile(days.dropna(), TTV_QUANTILES),
+                    overall.loc[step, quantile_columns(TTV_QUANTILES)].to_numpy(float), rtol=TOLERANCE)
+        for step, days in steps.items())
+    return checks
+
+# ==========================================
+# 3. ONE DATASET SIZE
+# ==========================================
+
+def run_size(size, num_users, backend, work_dir, modes, profile_name, streaming, check, trace_memory):
+    """Generate one dataset size and benchmark every stage on it (runs in its own process)"""
+    start_tracing(memory=trace_memory)
+    import PLG_Analytics_EDA_v2 as eda
+    from plg_data_generator import load_profile
+
+    timer = StageTimer()
+    extension = 'duckdb' if backend == 'duckdb' else 'db'
+    path = os.path.join(work_dir, f"bench_{size}.{extension}")
+    log_path = os.path.join(work_dir, f"bench_{size}.log")
+    # The stages' own progress output goes to the log, keeping the benchmark table readable
+    eda.REPORT_FILE = os.devnull
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        generate(timer, path, backend, num_users, load_profile(profile_name), streaming)
+
+        connection = eda.connect_embedded(backend, path)
+        results = {}
+        state_dir = os.path.join(work_dir, f"state_{size}")
+        # Incremental mode folds the new database from scratch
+        shutil.rmtree(state_dir, ignore_errors=True)
+        for index, mode in enumerate(modes):
+            dfs = load(timer, eda, connection, mode, state_dir)
+            results[mode] = run_analyses(timer, eda, dfs, mode, per_analysis=index == 0)
+            del dfs
+
+        checks = {}
+        if check:
+            reference = results[modes[0]]
+            for mode in modes[1:]:
+                differing = compare_tables(reference, results[mode])
+                checks[f"{mode}_vs_{modes[0]}"] = not differing
+                if differing:
+                    checks[f"{mode}_differs"] = differing
+            checks.update(reference_checks(connection, reference))
+        connection.close()
+
+    trace_path = os.path.join(work_dir, f"bench_{size}_trace.json")
+    write_trace(trace_path)
+    return {'stages': timer.stages, 'checks': checks, 'peak_rss_mb': round(peak_rss() / 1e6, 1),
+            'trace': trace_path}
+
+# ==========================================
+# 4. HISTORY
+# ==========================================
+
+def git_commit():
+    """Short commit hash of the checkout, or None outside a git repository"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def read_history(history_path):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def previous_record(history, record):
+    """Latest earlier run of the same benchmark configuration"""
+    keys = ['size', 'backend', 'profile', 'generator', 'modes']
+    matches = [entry for entry in history if all(entry.get(key) == record[key] for key in keys)]
+    return matches[-1] if matches else None
+
+def print_record(record, previous):
+    total = sum(stage['seconds'] for stage in record['stages'])
+    print(f"\n📏 {record['size']} users ({record['users']:,}, {record['backend']}) - "
+          f"{total:.2f}s, peak RSS {record['peak_rss_mb']:.1f}MB")
+    baseline = {stage['stage']: stage['seconds'] for stage in previous['stages']} if previous else {}
+    print(f"  {'Stage':<26} {'Seconds':>9} {'Rows':>12} {'Rows/s':>12} {'Peak RSS MB':>12} {'vs Last':>8}")
+    for stage in record['stages']:
+        rate = f"{stage['rows_per_s']:,}" if 'rows_per_s' in stage else '-'
+        rows = f"{stage['rows']:,}" if 'rows' in stage else '-'
+        ratio = (f"{stage['seconds'] / baseline[stage['stage']]:.2f}x"
+                 if baseline.get(stage['stage']) else '-')
+        print(f"  {stage['stage']:<26} {stage['seconds']:>9.3f} {rows:>12} {rate:>12} "
+              f"{stage['peak_rss_mb']:>12.1f} {ratio:>8}")
+    for name, passed in record['checks'].items():
+        if isinstance(passed, bool):
+            print(f"  {'✅' if passed else '❌'} {name}")
+        else:
+            print(f"     differing tables: {', '.join(passed)}")
+
+# ==========================================
+# 5. STARTUP TIME
+# ==========================================
+
+def command_arguments(arguments, backend, db, scratch):
+    return [argument.format(backend=backend, db=db, scratch=scratch) for argument in arguments]
+
+def time_command(arguments, work_dir):
+    """(seconds to the first output, seconds to exit, exit code) of one plg.py run
+
+    Output is unbuffered, as on a terminal, so the first line arrives as
+    soon as the command prints it.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, PLG_CLI] + arguments, cwd=work_dir, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdout.read(1)
+    first_output = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first_output, time.perf_counter() - start, process.returncode
+
+def heavy_imports(arguments, work_dir):
+    """Seconds spent importing each HEAVY_MODULES package in one run (python -X importtime)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', PLG_CLI] + arguments, cwd=work_dir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = {}
+    # Lines are "import time: self [us] | cumulative | <indent>module", each module after
+    # the ones it imported; read backwards, every module follows its importer
+    importers = []
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = len(parts[2]) - len(parts[2].lstrip())
+        package = parts[2].strip().split('.')[0]
+        while importers and importers[-1][0] >= depth:
+            importers.pop()
+        # Count a package's outermost imports only: their cumulative time includes the nested ones
+        if package in HEAVY_MODULES and all(importer != package for _, importer in importers):
+            imports[package] = round(imports.get(package, 0) + int(parts[1]) / 1e6, 3)
+        importers.append((depth, package))
+    return {package: imports[package] for package in HEAVY_MODULES if package in imports}
+
+def run_startup(backend, work_dir, num_users, repeats=STARTUP_REPEATS):
+    """Time-to-first-output and exit time of every STARTUP_COMMANDS entry (medians over repeats)"""
+    extension = 'duckdb' if backend == 'duckdb' else 'db'
+    db = os.path.abspath(os.path.join(work_dir, f"startup.{extension}"))
+    scratch = os.path.abspath(os.path.join(work_dir, f"startup_scratch.{extension}"))
+    if not os.path.exists(db):
+        subprocess.run([sys.executable, PLG_CLI, 'generate', '--sink', backend, '--db-path', db,
+                        '--users', str(num_users)], cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+
+    commands = []
+    for label, arguments in STARTUP_COMMANDS:
+        arguments = command_arguments(arguments, backend, db, scratch)
+        runs = []
+        for _ in range(repeats):
+            remove_database(scratch)
+            runs.append(time_command(arguments, work_dir))
+        remove_database(scratch)
+        commands.append({'command': label,
+                         'first_output_s': round(statistics.median(run[0] for run in runs), 4),
+                         'exit_s': round(statistics.median(run[1] for run in runs), 4),
+                         'exit_code': next((run[2] for run in runs if run[2]), 0),
+                         'imports': heavy_imports(arguments, work_dir)})
+        remove_database(scratch)
+    return commands
+
+def previous_startup(history, record):
+    matches = [entry for entry in history if entry.get('benchmark') == 'startup'
+               and entry.get('backend') == record['backend']]
+    return matches[-1] if matches else None
+
+def print_startup(record, previous):
+    print(f"\n🚦 plg.py start-up on {record['backend']} (median of {record['repeats']} runs)")
+    baseline = {command['command']: command['first_output_s'] for command in previous['commands']} if previous else {}
+    print(f"  {'Command':<22} {'First Output':>13} {'Exit':>9} {'vs Last':>8}  Heavy Imports")
+    for command in record['commands']:
+        ratio = (f"{command['first_output_s'] / baseline[command['command']]:.2f}x"
+                 if baseline.get(command['command']) else '-')
+        imports = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in command['imports'].items()) or '-'
+        status = '' if command['exit_code'] == 0 else f"  ❌ exit code {command['exit_code']}"
+        print(f"  {command['command']:<22} {command['first_output_s']:>12.3f}s {command['exit_s']:>8.3f}s "
+              f"{ratio:>8}  {imports}{status}")
+
+# ==========================================
+# 6. MAIN EXECUTION
+# ==========================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the generator and EDA stages on an embedded database")
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k'], choices=BENCHMARK_SIZES,
+                        help="dataset sizes to generate and benchmark")
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'duckdb'],
+                        help="embedded database standing in for MySQL")
+    parser.add_argument('--modes', nargs='+', default=BENCHMARK_MODES,
+                        choices=['memory', 'pushdown', 'auto', 'incremental', 'chunked'],
+                        help="EDA execution modes; the first is timed per analysis and the others must match it")
+    parser.add_argument('--profile', default='default', help="generator scale profile (users come from --sizes)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="time the streaming generate_dataset instead of the generate_* stages")
+    parser.add_argument('--work-dir', default=BENCHMARK_DIR, help="databases, logs, traces and the history")
+    parser.add_argument('--history', default=None, help=f"JSON Lines history (default <work-dir>/{HISTORY_FILE})")
+    parser.add_argument('--no-check', action='store_true', help="skip the correctness checks")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="also record tracemalloc allocation peaks per stage (slower)")
+    parser.add_argument('--startup', action='store_true',
+                        help="instead, time each plg.py command's start-up to its first output "
+                             "(on a database of the first --sizes)")
+    parser.add_argument('--repeats', type=int, default=STARTUP_REPEATS, help="runs per command with --startup")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.makedirs(args.work_dir, exist_ok=True)
+    history_path = args.history or os.path.join(args.work_dir, HISTORY_FILE)
+    history = read_history(history_path)
+    run = {'run_id': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+           'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+    if args.startup:
+        num_users = BENCHMARK_SIZES[args.sizes[0]]
+        commands = run_startup(args.backend, args.work_dir, num_users, args.repeats)
+        record = dict(run, benchmark='startup', backend=args.backend, users=num_users, repeats=args.repeats,
+                      commands=commands)
+        print_startup(record, previous_startup(history, record))
+        with open(history_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"\n📈 History appended to: {history_path}")
+        if any(command['exit_code'] for command in commands):
+            sys.exit(1)
+        return
+
+    print("\n" + "="*60)
+    print(f"⏱️ PLG BENCHMARK - {', '.join(args.sizes)} users on {args.backend}")
+    print("="*60)
+
+    failed = False
+    for size in args.sizes:
+        # A fresh process per size: peak RSS and imports are not carried over between sizes
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            result = pool.submit(run_size, size, BENCHMARK_SIZES[size], args.backend, args.work_dir, args.modes,
+                                 args.profile, args.streaming, not args.no_check, args.trace_memory).result()
+
+        record = dict(run, size=size, users=BENCHMARK_SIZES[size], backend=args.backend, profile=args.profile,
+                      generator='streaming' if args.streaming else 'staged', modes=args.modes, **result)
+        print_record(record, previous_record(history, record))
+        failed = failed or not all(passed for passed in record['checks'].values() if isinstance(passed, bool))
+
+        with open(history_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        history.append(record)
+
+    print(f"\n📈 History appended to: {history_path}")
+    if failed:
+        print("❌ Some correctness checks failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
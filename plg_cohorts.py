@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# Funnel milestones: event_type -> first-date column (as in fact_cohort_data)
+MILESTONES = {
+    'activation': 'activation_date',
+    'feature_use': 'feature_adoption_date',
+    'pql_qualified': 'pql_date',
+    'payment_complete': 'payment_date'
+}
+DAYS_TO = {
+    'activation_date': 'days_to_activation',
+    'pql_date': 'days_to_pql',
+    'payment_date': 'days_to_payment'
+}
+GRANULARITIES = ['day', 'week', 'month']
+
+# milestone_days value of a milestone never reached
+NEVER = np.iinfo(np.int64).max
+
+def as_days(values):
+    return np.asarray(values).astype('datetime64[D]')
+
+def cohort_start(dates, granularity='week'):
+    """First day of the cohort each date falls in (weeks start on Monday)"""
+    days = as_days(dates)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday, weekday 3
+        offsets = days.astype(np.int64)
+        return (offsets - (offsets + 3) % 7).astype('datetime64[D]')
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Unknown cohort granularity: {granularity}")
+
+def periods_since(signup_dates, dates, granularity='week'):
+    """Whole cohort periods between signup and each date (0 = signup period)"""
+    if granularity == 'month':
+        return (as_days(dates).astype('datetime64[M]') - as_days(signup_dates).astype('datetime64[M]')).astype(np.int64)
+    days = (as_days(dates) - as_days(signup_dates)).astype(np.int64)
+    return days // 7 if granularity == 'week' else days
+
+def user_rows(users, user_ids):
+    """Row of each user_id in users, -1 for unknown users"""
+    known_ids = users['user_id'].to_numpy()
+    lookup = np.full(int(known_ids.max()) + 1 if len(known_ids) else 1, -1, dtype=np.int64)
+    lookup[known_ids] = np.arange(len(known_ids))
+    user_ids = np.asarray(user_ids)
+    rows = np.full(len(user_ids), -1, dtype=np.int64)
+    in_range = (user_ids >= 0) & (user_ids < len(lookup))
+    rows[in_range] = lookup[user_ids[in_range]]
+    return rows
+
+def milestone_days(users, events, out=None):
+    """First day (days since epoch) each user reached each milestone, NEVER if not
+
+    One group-first pass: every milestone event updates the minimum day of
+    its (user, milestone) cell; repeated events are handled by the minimum.
+    With out, a batch of events is folded into existing days in place.
+    """
+    if out is None:
+        out = np.full((len(users), len(MILESTONES)), NEVER, dtype=np.int64)
+    first_days = out.reshape(-1)
+    event_types = events['event_type'].astype('category')
+    stage_of = np.array([list(MILESTONES).index(event_type) if event_type in MILESTONES else -1
+                         for event_type in event_types.cat.categories] + [-1])
+    stages = stage_of[event_types.cat.codes.to_numpy()]
+    rows = user_rows(users, events['user_id'].to_numpy())
+    selected = (stages >= 0) & (rows >= 0)
+
+    event_days = as_days(events['event_timestamp'].to_numpy()[selected]).astype(np.int64)
+    np.minimum.at(first_days, rows[selected] * len(MILESTONES) + stages[selected], event_days)
+    return out
+
+def milestones_frame(users, first_days):
+    """fact_cohort_data columns from the per-user milestone_days"""
+    signup_dates = as_days(users['signup_date'])
+    milestones = pd.DataFrame({'user_id': users['user_id'].to_numpy(), 'signup_date': signup_dates})
+    for stage, column in enumerate(MILESTONES.values()):
+        reached = first_days[:, stage] != NEVER
+        dates = np.where(reached, first_days[:, stage], 0).astype('datetime64[D]')
+        dates[~reached] = np.datetime64('NaT')
+        milestones[column] = dates
+        if column in DAYS_TO:
+            days = pd.array((dates - signup_dates).astype(np.int32), dtype='Int32')
+            days[~reached] = pd.NA
+            milestones[DAYS_TO[column]] = days
+    return milestones
+
+def user_milestones(users, events):
+    """fact_cohort_data columns computed from dim_users + fact_user_events"""
+    return milestones_frame(users, milestone_days(users, events))
+
+def summarize_cohorts(milestones, granularity='week'):
+    """Users per cohort and how many reached each milestone"""
+    cohorts = pd.Index(cohort_start(milestones['signup_date'], granularity), name='cohort_date')
+    reached = milestones[list(MILESTONES.values())].notna()
+    reached.insert(0, 'Total', True)
+    summary = reached.groupby(cohorts).sum()
+    return summary.rename(columns={
+        'activation_date': 'Activated',
+        'feature_adoption_date': 'Feature',
+        'pql_date': 'PQL',
+        'payment_date': 'Paid'
+    })
+
+def active_periods(users, events, granularity='week', periods=8, out=None):
+    """Per-user bitmask of the periods 0..periods-1 after signup with any event
+
+    With out, a batch of events is ORed into existing bitmasks in place.
+    """
+    if periods > 64:
+        raise ValueError(f"At most 64 retention periods are supported, got {periods}")
+    signup_dates = as_days(users['signup_date'])
+    rows = user_rows(users, events['user_id'].to_numpy())
+    known = rows >= 0
+    rows = rows[known]
+
+    period = periods_since(signup_dates[rows], events['event_timestamp'].to_numpy()[known], granularity)
+    in_window = (period >= 0) & (period < periods)
+    active = np.zeros(len(signup_dates), dtype=np.uint64) if out is None else out
+    np.bitwise_or.at(active, rows[in_window], np.left_shift(np.uint64(1), period[in_window].astype(np.uint64)))
+    return active
+
+def retention_from_periods(signup_dates, active, granularity='week', periods=8):
+    """retention_matrix from the per-user active_periods bitmasks"""
+    cohort_labels, cohort_index = np.unique(cohort_start(signup_dates, granularity), return_inverse=True)
+    counts = np.zeros((len(cohort_labels), periods), dtype=np.int64)
+    for period in range(periods):
+        counts[:, period] = np.bincount(cohort_index, weights=(active >> np.uint64(period)) & np.uint64(1),
+                                        minlength=len(cohort_labels))
+    sizes = np.bincount(cohort_index, minlength=len(cohort_labels))
+
+    matrix = pd.DataFrame(counts / sizes[:, None] * 100, index=pd.Index(cohort_labels, name='cohort_date'),
+                          columns=range(periods))
+    matrix.insert(0, 'Users', sizes)
+    return matrix
+
+def retention_matrix(users, events, granularity='week', periods=8):
+    """Share of each cohort active (any event) in period N after signup
+
+    Rows are cohorts, columns 0..periods-1; each user counts once per period
+    however many events they had in it.
+    """
+    return retention_from_periods(users['signup_date'], active_periods(users, events, granularity, periods),
+                                  granularity, periods)
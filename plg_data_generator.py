@@ -1,366 +1,754 @@
-import mysql.connector
-from faker import Faker
-import random
-from datetime import datetime, timedelta
+import argparse
+import collections
+import functools
 import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from plg_db import db_config, print_statistics
+from plg_metadata import FEATURES, metadata_id
+from plg_scheduler import StageScheduler, print_timeline
+from plg_sinks import TABLES, BackgroundWriter, SinkPool, load_staged, open_sink
+from plg_trace import print_trace_summary, profiled, span, start_tracing, traced, write_trace
 
-# Initialize Faker with seed for reproducible data
-fake = Faker()
-fake.seed_instance(42)
-random.seed(42)
-
-# MySQL connection configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'kaushikyeddanapudi_75',
-    'database': 'plg_analytics',
-    'charset': 'utf8mb4'
+# Base seed for reproducible data
+SEED = 42
+
+# Independent random stream per table of the stage-by-stage functions (stage_rng)
+STAGE_STREAMS = {'dim_users': 0, 'fact_user_events': 1, 'fact_ab_tests': 2}
+
+# Synthetic identity vocabulary, drawn once from Faker per seed
+IDENTITY_POOL_SIZE = 2000
+
+# Users simulated per chunk - bounds memory in the streaming pipeline
+CHUNK_SIZE = 50000
+
+# User attributes
+USER_SEGMENTS = np.array(['Organic', 'Paid', 'Referral', 'Direct'], dtype=object)
+DEVICE_TYPES = np.array(['Desktop', 'Mobile', 'Tablet'], dtype=object)
+PLATFORMS = np.array(['Web', 'iOS', 'Android'], dtype=object)
+INDUSTRIES = np.array(['SaaS', 'Finance', 'Healthcare', 'Retail', 'Tech', 'E-commerce', 'Education', 'Media'], dtype=object)
+SIGNUP_START = np.datetime64('2024-01-01')
+SIGNUP_DAYS = 331
+
+# Funnel conversion rates (each stage conditional on the previous one)
+ACTIVATION_RATE = 0.70
+FEATURE_ADOPTION_RATE = 0.50
+PQL_RATE = 0.40
+CONVERSION_RATE = 0.25
+
+EVENT_TYPES = np.array(['signup', 'activation', 'feature_use', 'pql_qualified', 'payment_complete'], dtype=object)
+
+# Event metadata is dictionary-encoded: rows carry the small metadata_id of
+# their payload in dim_event_metadata, nothing is serialized per event
+STAGE_METADATA_IDS = np.array([
+    metadata_id({'source': 'web', 'plan': 'free'}),
+    metadata_id({'event': 'completed_onboarding'}),
+    0,  # filled per user from FEATURE_METADATA_IDS
+    metadata_id({'pql_reason': 'high_usage_score'}),
+    metadata_id({'plan': 'pro', 'payment_method': 'credit_card'}),
+], dtype=np.int16)
+FEATURE_METADATA_IDS = np.array([metadata_id({'feature': feature}) for feature in FEATURES], dtype=np.int16)
+
+# Funnel milestones tracked in fact_cohort_data
+MILESTONE_EVENTS = {
+    'activation': 'activation_date',
+    'feature_use': 'feature_adoption_date',
+    'pql_qualified': 'pql_date',
+    'payment_complete': 'payment_date',
+}
+MILESTONE_COLUMNS = ['user_id', 'signup_date'] + list(MILESTONE_EVENTS.values())
+
+# A/B tests: (name, variants, treatment lift over the baseline conversion rate)
+AB_TEST_SCENARIOS = [
+    ('onboarding_flow', ['control', 'treatment_quick_start'], 0.65),
+    ('pricing_strategy', ['control_7day_trial', 'treatment_freemium'], 0.50),
+    ('feature_adoption', ['control', 'treatment_tooltip_guide'], 0.55)
+]
+AB_BASELINE_RATE = 0.15
+AB_TEST_START = np.datetime64('2024-01-15')
+AB_TEST_DAYS = 167
+AB_TEST_END = np.datetime64('2024-06-30')
+
+# Scale profile: volume, date windows and activity model of a generated slice
+# (append mode shifts the windows). --profile takes a preset or a JSON file.
+DEFAULT_PROFILE = {
+    'users': 10000,
+    'signup_start': SIGNUP_START,
+    'signup_days': SIGNUP_DAYS,
+    'ab_test_start': AB_TEST_START,
+    'ab_test_days': AB_TEST_DAYS,
+    'ab_test_end': AB_TEST_END,
+    'ab_test_fraction': 0.8,              # share of the slice's users enrolled in every A/B test
+    'feature_sessions_mean': 0,           # repeat feature_use sessions per adopted user
+    'feature_sessions_dispersion': 1.0,   # negative binomial shape - lower is heavier-tailed
+    'activity_days': 90,                  # repeat sessions fall within this many days of adoption
+}
+SCALE_PROFILES = {
+    'default': DEFAULT_PROFILE,
+    'large': dict(DEFAULT_PROFILE, users=1000000, feature_sessions_mean=8),
+    # ~10M users * 35% adopters * 30 sessions: 100M+ fact_user_events rows
+    'stress': dict(DEFAULT_PROFILE, users=10000000, feature_sessions_mean=30, feature_sessions_dispersion=0.5),
 }
+PROFILE_DATES = ['signup_start', 'ab_test_start', 'ab_test_end']
 
-def connect_to_mysql():
-    """Establish MySQL connection"""
+def connect_to_mysql(**options):
+    """Establish MySQL connection (settings from plg_db.db_config: PLG_DB_* / plg.ini)"""
+    import mysql.connector
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = mysql.connector.connect(**db_config(), **options)
         print("✅ Connected to MySQL successfully!")
         return connection
     except mysql.connector.Error as e:
         print(f"❌ Error connecting to MySQL: {e}")
-        print("💡 Check if MySQL is running and password is correct.")
+        print("💡 Check if MySQL is running and PLG_DB_PASSWORD (or plg.ini) is correct.")
         return None
 
-def generate_users(connection, num_users=10000):
-    """Generate user dimension data with UNIQUE emails"""
+def open_connection_pool(pool_size):
+    """MySQL connection pool, one connection per concurrent stage worker"""
+    import mysql.connector.pooling
+    try:
+        pool = mysql.connector.pooling.MySQLConnectionPool(pool_name='plg_generator', pool_size=pool_size,
+                                                           **db_config())
+        print(f"✅ Opened MySQL connection pool ({pool_size} connections)!")
+        return pool
+    except mysql.connector.Error as e:
+        print(f"❌ Error opening MySQL connection pool: {e}")
+        return None
+
+def load_profile(name):
+    """Scale profile by preset name, or from a JSON file overriding the defaults"""
+    if name in SCALE_PROFILES:
+        return dict(SCALE_PROFILES[name])
+    
+    with open(name, encoding='utf-8') as profile_file:
+        overrides = json.load(profile_file)
+    unknown = set(overrides) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown scale profile settings: {', '.join(sorted(unknown))}")
+    
+    profile = dict(DEFAULT_PROFILE, **overrides)
+    for key in PROFILE_DATES:
+        profile[key] = np.datetime64(profile[key], 'D')
+    return profile
+
+def ab_test_cutoff(first_user_id, num_users, profile=DEFAULT_PROFILE):
+    """First user_id past a slice's A/B test population"""
+    return first_user_id + int(round(profile['ab_test_fraction'] * num_users))
+
+def stage_rng(seed, table):
+    """Generator for one table of the stage-by-stage functions, seeded with (seed, stream)"""
+    return np.random.default_rng([seed, STAGE_STREAMS[table]])
+
+@functools.lru_cache(maxsize=None)
+def build_identity_pool(seed=SEED, size=IDENTITY_POOL_SIZE):
+    """Seedable vocabulary of company names, countries and email parts
+
+    Faker is only called `size` times per field; users then draw from the
+    pool by index, so cost stays linear and uniqueness never runs out.
+    """
+    # Faker is only needed here, so commands that never simulate users don't import it
+    from faker import Faker
+    from faker.providers.address.en_US import Provider as AddressProvider
+    pool_fake = Faker()
+    pool_fake.seed_instance(seed)
+    return {
+        'company_name': np.array([pool_fake.company() for _ in range(size)], dtype=object),
+        'country': np.array(AddressProvider.countries, dtype=object),
+        'email_local': np.array([pool_fake.user_name() for _ in range(size)], dtype=object),
+        'email_domain': np.array(['example.com', 'example.net', 'example.org'], dtype=object),
+    }
+
+def simulate_users(user_ids, rng, pool, signup_start=SIGNUP_START, signup_days=SIGNUP_DAYS):
+    """Simulate dim_users columns for the given user_ids
+
+    Emails are '<local>.<user_id>@<domain>': the user_id after the last dot
+    makes every address unique, whatever the pool size or user count.
+    """
+    user_ids = np.asarray(user_ids)
+    num_users = len(user_ids)
+    
+    local_parts = pool['email_local'][rng.integers(0, len(pool['email_local']), num_users)]
+    domains = pool['email_domain'][rng.integers(0, len(pool['email_domain']), num_users)]
+    emails = [f"{local}.{user_id}@{domain}"
+              for local, user_id, domain in zip(local_parts, user_ids.tolist(), domains)]
+    
+    return {
+        'user_id': user_ids,
+        'email': np.array(emails, dtype=object),
+        'company_name': pool['company_name'][rng.integers(0, len(pool['company_name']), num_users)],
+        'user_segment': USER_SEGMENTS[rng.integers(0, len(USER_SEGMENTS), num_users)],
+        'signup_date': signup_start + rng.integers(0, signup_days, num_users),
+        'country': pool['country'][rng.integers(0, len(pool['country']), num_users)],
+        'device_type': DEVICE_TYPES[rng.integers(0, len(DEVICE_TYPES), num_users)],
+        'platform': PLATFORMS[rng.integers(0, len(PLATFORMS), num_users)],
+        'industry': INDUSTRIES[rng.integers(0, len(INDUSTRIES), num_users)],
+    }
+
+@traced
+def generate_users(sink, num_users=10000, seed=SEED, chunk_size=CHUNK_SIZE, profile=DEFAULT_PROFILE):
+    """Generate user dimension data with UNIQUE emails
+
+    Users are written chunk by chunk; only their ids and signup dates are
+    kept and returned for the downstream stages.
+    """
     print(f"\n🔄 Generating {num_users:,} users...")
-    cursor = connection.cursor()
-    
-    user_segments = ['Organic', 'Paid', 'Referral', 'Direct']
-    device_types = ['Desktop', 'Mobile', 'Tablet']
-    platforms = ['Web', 'iOS', 'Android']
-    industries = ['SaaS', 'Finance', 'Healthcare', 'Retail', 'Tech', 'E-commerce', 'Education', 'Media']
     
-    users_data = []
-    start_date = datetime(2024, 1, 1)
+    first_user_id = sink.next_user_id()
+    pool = build_identity_pool(seed)
+    rng = stage_rng(seed, 'dim_users')
+    signup_dates = []
     
-    # Clear any previous unique cache
-    fake.unique.clear()
+    for chunk_ids in user_id_chunks(first_user_id, num_users, chunk_size):
+        users = simulate_users(chunk_ids, rng, pool, profile['signup_start'], profile['signup_days'])
+        sink.write('dim_users', users)
+        signup_dates.append(users['signup_date'])
     
-    for i in range(num_users):
-        signup_date = start_date + timedelta(days=random.randint(0, 330))
-        email = fake.unique.email()  # UNIQUE email guaranteed
-        
-        users_data.append((
-            email,
-            fake.company(),
-            random.choice(user_segments),
-            signup_date.date(),
-            fake.country(),
-            random.choice(device_types),
-            random.choice(platforms),
-            random.choice(industries)
-        ))
-    
-    cursor.executemany("""
-        INSERT INTO dim_users (email, company_name, user_segment, signup_date, country, 
-                              device_type, platform, industry)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    """, users_data)
-    
-    connection.commit()
-    cursor.close()
     print(f"✅ Generated {num_users:,} users!")
+    return {
+        'user_id': np.arange(first_user_id, first_user_id + num_users, dtype=np.int64),
+        'signup_date': np.concatenate(signup_dates) if signup_dates else np.array([], dtype='datetime64[D]'),
+    }
+
+def user_id_chunks(first_user_id, num_users, chunk_size=CHUNK_SIZE):
+    """Yield consecutive user_id arrays of at most chunk_size"""
+    for start in range(first_user_id, first_user_id + num_users, chunk_size):
+        yield np.arange(start, min(start + chunk_size, first_user_id + num_users), dtype=np.int64)
+
+def database_cursor(sink, rows):
+    """Cursor on the sink's database, to read back rows the caller didn't pass in"""
+    if sink.connection is None:
+        raise ValueError(f"{type(sink).__name__} has no database to read {rows} from - pass them in")
+    return sink.connection.cursor()
+
+def load_users(cursor):
+    """Read ids and signup dates of the users already in the database"""
+    cursor.execute("SELECT user_id, signup_date FROM dim_users ORDER BY user_id")
+    users = cursor.fetchall()
+    return {
+        'user_id': np.array([user_id for user_id, _ in users], dtype=np.int64),
+        'signup_date': np.array([signup_date for _, signup_date in users], dtype='datetime64[D]'),
+    }
+
+def simulate_user_events(user_ids, signup_dates, rng, profile=DEFAULT_PROFILE):
+    """Simulate funnel journeys for a batch of users as column arrays
+
+    Every stage outcome and time offset is drawn for the whole batch at once;
+    funnel rows come back in per-user journey order (signup -> payment),
+    followed by the profile's repeat feature_use sessions.
+    """
+    n = len(user_ids)
+    signup_ts = np.asarray(signup_dates, dtype='datetime64[D]').astype('datetime64[s]')
+    
+    # Bernoulli outcomes - each stage is conditional on reaching the previous one
+    reached = np.empty((n, len(EVENT_TYPES)), dtype=bool)
+    reached[:, 0] = True
+    reached[:, 1] = rng.random(n) < ACTIVATION_RATE
+    reached[:, 2] = reached[:, 1] & (rng.random(n) < FEATURE_ADOPTION_RATE)
+    reached[:, 3] = reached[:, 2] & (rng.random(n) < PQL_RATE)
+    reached[:, 4] = reached[:, 3] & (rng.random(n) < CONVERSION_RATE)
+    
+    # Time offsets between consecutive stages
+    timestamps = np.empty((n, len(EVENT_TYPES)), dtype='datetime64[s]')
+    timestamps[:, 0] = signup_ts
+    timestamps[:, 1] = timestamps[:, 0] + rng.integers(1, 73, n).astype('timedelta64[h]')
+    timestamps[:, 2] = timestamps[:, 1] + rng.integers(2, 169, n).astype('timedelta64[h]')
+    timestamps[:, 3] = timestamps[:, 2] + rng.integers(1, 15, n).astype('timedelta64[D]')
+    timestamps[:, 4] = timestamps[:, 3] + rng.integers(1, 31, n).astype('timedelta64[D]')
+    
+    values = np.zeros((n, len(EVENT_TYPES)))
+    values[:, 4] = np.round(rng.uniform(29, 299, n), 2)
+    
+    metadata_ids = np.tile(STAGE_METADATA_IDS, (n, 1))
+    metadata_ids[:, 2] = FEATURE_METADATA_IDS[rng.integers(0, len(FEATURES), n)]
+    
+    mask = reached.ravel()
+    events = {
+        'user_id': np.repeat(np.asarray(user_ids), len(EVENT_TYPES))[mask],
+        'event_type': np.tile(EVENT_TYPES, n)[mask],
+        'event_timestamp': timestamps.ravel()[mask],
+        'event_value': values.ravel()[mask],
+        'metadata_id': metadata_ids.ravel()[mask],
+    }
+    if profile['feature_sessions_mean'] <= 0:
+        return events
+    
+    # Repeat sessions after adoption: negative binomial counts give a long tail of power users
+    adopters = np.flatnonzero(reached[:, 2])
+    shape = profile['feature_sessions_dispersion']
+    counts = rng.negative_binomial(shape, shape / (shape + profile['feature_sessions_mean']), len(adopters))
+    owners = np.repeat(adopters, counts)
+    offsets = rng.integers(1, profile['activity_days'] * 24 + 1, len(owners)).astype('timedelta64[h]')
+    
+    sessions = {
+        'user_id': np.asarray(user_ids)[owners],
+        'event_type': np.full(len(owners), 'feature_use', dtype=object),
+        'event_timestamp': timestamps[owners, 2] + offsets,
+        'event_value': np.zeros(len(owners)),
+        'metadata_id': FEATURE_METADATA_IDS[rng.integers(0, len(FEATURES), len(owners))],
+    }
+    return {column: np.concatenate([events[column], sessions[column]]) for column in events}
 
-def generate_user_events(connection, num_users=10000):
-    """Generate user event journey data"""
+@traced
+def generate_user_events(sink, users=None, batch_size=20000, profile=DEFAULT_PROFILE, seed=SEED):
+    """Generate user event journey data
+
+    users defaults to every user already in the sink's database.
+    """
     print(f"\n🔄 Generating user events (funnel journey)...")
-    cursor = connection.cursor()
     
-    # Get all user IDs
-    cursor.execute("SELECT user_id, signup_date FROM dim_users")
-    users = cursor.fetchall()
+    if users is None:
+        users = load_users(database_cursor(sink, 'users'))
+    user_ids = users['user_id']
+    signup_dates = users['signup_date']
+    rng = stage_rng(seed, 'fact_user_events')
     
-    events_data = []
-    batch_size = 50000
     event_count = 0
+    milestone_batches = []
+    
+    # Simulate and insert one batch of users at a time
+    for start in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[start:start + batch_size]
+        batch_signups = signup_dates[start:start + batch_size]
+        events = simulate_user_events(batch_ids, batch_signups, rng, profile)
+        milestone_batches.append(summarize_milestones(batch_ids, batch_signups, events))
+        
+        event_count += sink.write('fact_user_events', events)
+        print(f"   Inserted {event_count:,} events...")
     
-    # Event type probabilities (funnel conversion rates)
-    activation_rate = 0.70
-    feature_adoption_rate = 0.50
-    pql_rate = 0.40
-    conversion_rate = 0.25
+    print(f"✅ Generated {event_count:,} user events!")
     
-    for user_id, signup_date in users:
-        signup_timestamp = datetime.combine(signup_date, datetime.min.time())
+    # Hand the per-user milestones to generate_cohort_data
+    return {column: np.concatenate([batch[column] for batch in milestone_batches])
+            for column in MILESTONE_COLUMNS}
+
+def simulate_ab_tests(user_ids, rng, test_start=AB_TEST_START, test_days=AB_TEST_DAYS, test_end=AB_TEST_END):
+    """Simulate fact_ab_tests columns, every scenario over the same users"""
+    user_ids = np.asarray(user_ids)
+    n = len(user_ids)
+    columns = {name: [] for name in ['user_id', 'test_name', 'variant', 'test_start_date',
+                                     'test_end_date', 'converted', 'conversion_timestamp']}
+    
+    for test_name, variants, conversion_lift in AB_TEST_SCENARIOS:
+        variant_index = rng.integers(0, len(variants), n)
+        test_dates = test_start + rng.integers(0, test_days, n)
         
-        # EVENT 1: Signup (always happens)
-        events_data.append((
-            user_id,
-            'signup',
-            signup_timestamp,
-            0,
-            json.dumps({'source': 'web', 'plan': 'free'})
-        ))
-        event_count += 1
+        # Determine if user converted
+        is_treatment = np.array([variant.startswith('treatment') for variant in variants])[variant_index]
+        rate = np.where(is_treatment, AB_BASELINE_RATE + conversion_lift, AB_BASELINE_RATE)
+        converted = (rng.random(n) < rate).astype(np.int64)
         
-        # EVENT 2: Activation (70% of users)
-        if random.random() < activation_rate:
-            activation_timestamp = signup_timestamp + timedelta(hours=random.randint(1, 72))
-            events_data.append((
-                user_id,
-                'activation',
-                activation_timestamp,
-                0,
-                json.dumps({'event': 'completed_onboarding'})
-            ))
-            event_count += 1
-            
-            # EVENT 3: Feature Usage (50% of activated users)
-            if random.random() < feature_adoption_rate:
-                feature_timestamp = activation_timestamp + timedelta(hours=random.randint(2, 168))
-                features = ['dashboard_view', 'analytics_report', 'data_export', 'automation_setup']
-                events_data.append((
-                    user_id,
-                    'feature_use',
-                    feature_timestamp,
-                    0,
-                    json.dumps({'feature': random.choice(features)})
-                ))
-                event_count += 1
-                
-                # EVENT 4: PQL Qualification (40% of engaged users)
-                if random.random() < pql_rate:
-                    pql_timestamp = feature_timestamp + timedelta(days=random.randint(1, 14))
-                    events_data.append((
-                        user_id,
-                        'pql_qualified',
-                        pql_timestamp,
-                        0,
-                        json.dumps({'pql_reason': 'high_usage_score'})
-                    ))
-                    event_count += 1
-                    
-                    # EVENT 5: Payment (25% of PQLs)
-                    if random.random() < conversion_rate:
-                        payment_timestamp = pql_timestamp + timedelta(days=random.randint(1, 30))
-                        payment_amount = round(random.uniform(29, 299), 2)
-                        events_data.append((
-                            user_id,
-                            'payment_complete',
-                            payment_timestamp,
-                            payment_amount,
-                            json.dumps({'plan': 'pro', 'payment_method': 'credit_card'})
-                        ))
-                        event_count += 1
+        # Only set conversion_timestamp if converted
+        conversion_timestamps = (test_dates.astype('datetime64[s]')
+                                 + rng.integers(1, 31, n).astype('timedelta64[D]'))
+        conversion_timestamps[converted == 0] = np.datetime64('NaT')
         
-        # Batch insert for performance
-        if len(events_data) >= batch_size:
-            cursor.executemany("""
-                INSERT INTO fact_user_events (user_id, event_type, event_timestamp, event_value, metadata)
-                VALUES (%s, %s, %s, %s, %s)
-            """, events_data)
-            connection.commit()
-            print(f"   Inserted {event_count:,} events...")
-            events_data = []
-    
-    # Insert remaining events
-    if events_data:
-        cursor.executemany("""
-            INSERT INTO fact_user_events (user_id, event_type, event_timestamp, event_value, metadata)
-            VALUES (%s, %s, %s, %s, %s)
-        """, events_data)
-        connection.commit()
-    
-    cursor.close()
-    print(f"✅ Generated {event_count:,} user events!")
+        columns['user_id'].append(user_ids)
+        columns['test_name'].append(np.full(n, test_name, dtype=object))
+        columns['variant'].append(np.array(variants, dtype=object)[variant_index])
+        columns['test_start_date'].append(test_dates)
+        columns['test_end_date'].append(np.full(n, test_end))
+        columns['converted'].append(converted)
+        columns['conversion_timestamp'].append(conversion_timestamps)
+    
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
 
-def generate_ab_tests(connection, num_users=10000):
-    """Generate A/B test assignment data - FIXED VERSION"""
+@traced
+def generate_ab_tests(sink, users=None, chunk_size=CHUNK_SIZE, profile=DEFAULT_PROFILE, seed=SEED):
+    """Generate A/B test assignment data for the profile's share of users"""
     print(f"\n🔄 Generating A/B test assignments...")
-    cursor = connection.cursor()
-    
-    cursor.execute("SELECT user_id FROM dim_users")
-    user_ids = [row[0] for row in cursor.fetchall()]
-    
-    test_scenarios = [
-        ('onboarding_flow', ['control', 'treatment_quick_start'], 0.65),
-        ('pricing_strategy', ['control_7day_trial', 'treatment_freemium'], 0.50),
-        ('feature_adoption', ['control', 'treatment_tooltip_guide'], 0.55)
-    ]
-    
-    ab_tests_data = []
-    test_start = datetime(2024, 1, 15)
-    test_end = datetime(2024, 6, 30)
-    
-    for test_name, variants, conversion_lift in test_scenarios:
-        for user_id in user_ids[:8000]:
-            variant = random.choice(variants)
-            test_date = test_start + timedelta(days=random.randint(0, 166))
-            
-            # Determine if user converted
-            if variant.startswith('treatment'):
-                converted = 1 if random.random() < (0.15 + conversion_lift) else 0
-            else:
-                converted = 1 if random.random() < 0.15 else 0
-            
-            # Only set conversion_timestamp if converted
-            if converted == 1:
-                conversion_timestamp = test_date + timedelta(days=random.randint(1, 30))
-            else:
-                conversion_timestamp = None
-            
-            ab_tests_data.append((
-                user_id,
-                test_name,
-                variant,
-                test_date.date(),
-                test_end.date(),
-                converted,
-                conversion_timestamp  # ✅ NOW HANDLES None PROPERLY
-            ))
-    
-    # FIX: Insert in smaller batches to handle None values
-    batch_size = 5000
-    for i in range(0, len(ab_tests_data), batch_size):
-        batch = ab_tests_data[i:i+batch_size]
-        try:
-            cursor.executemany("""
-                INSERT INTO fact_ab_tests (user_id, test_name, variant, test_start_date, test_end_date, converted, conversion_timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, batch)
-            connection.commit()
-        except Exception as e:
-            print(f"   ⚠️ Error in batch {i//batch_size + 1}: {e}")
-            connection.rollback()
-            raise
-    
-    cursor.close()
-    print(f"✅ Generated {len(ab_tests_data):,} A/B test assignments!")
-
-def generate_cohort_data(connection, num_users=10000):
-    """Generate cohort analysis data"""
-    print(f"\n🔄 Generating cohort analysis data...")
-    cursor = connection.cursor()
     
-    cursor.execute("SELECT user_id, signup_date FROM dim_users")
-    users = cursor.fetchall()
+    if users is None:
+        users = load_users(database_cursor(sink, 'users'))
     
-    cohort_data = []
+    test_users = users['user_id'][:ab_test_cutoff(0, len(users['user_id']), profile)]
+    rng = stage_rng(seed, 'fact_ab_tests')
+    count = 0
+    for start in range(0, len(test_users), chunk_size):
+        count += sink.write('fact_ab_tests', simulate_ab_tests(test_users[start:start + chunk_size], rng,
+                                                               profile['ab_test_start'], profile['ab_test_days'],
+                                                               profile['ab_test_end']))
     
-    for user_id, signup_date in users:
-        # Cohort = signup week
-        cohort_date = signup_date - timedelta(days=signup_date.weekday())
-        
-        # Pull event timeline for this user
-        cursor.execute("""
-            SELECT event_type, event_timestamp FROM fact_user_events 
-            WHERE user_id = %s ORDER BY event_timestamp
-        """, (user_id,))
-        events = cursor.fetchall()
-        
-        activation_date = None
-        feature_date = None
-        pql_date = None
-        payment_date = None
-        
-        for event_type, event_timestamp in events:
-            if event_type == 'activation' and not activation_date:
-                activation_date = event_timestamp.date() if isinstance(event_timestamp, datetime) else event_timestamp
-            elif event_type == 'feature_use' and not feature_date:
-                feature_date = event_timestamp.date() if isinstance(event_timestamp, datetime) else event_timestamp
-            elif event_type == 'pql_qualified' and not pql_date:
-                pql_date = event_timestamp.date() if isinstance(event_timestamp, datetime) else event_timestamp
-            elif event_type == 'payment_complete' and not payment_date:
-                payment_date = event_timestamp.date() if isinstance(event_timestamp, datetime) else event_timestamp
+    print(f"✅ Generated {count:,} A/B test assignments!")
+
+def summarize_milestones(user_ids, signup_dates, events):
+    """First date each user reached every funnel milestone (NaT if never)"""
+    user_ids = np.asarray(user_ids)
+    order = np.argsort(user_ids, kind='stable')
+    
+    milestones = {
+        'user_id': user_ids,
+        'signup_date': np.asarray(signup_dates, dtype='datetime64[D]'),
+    }
+    
+    event_days = events['event_timestamp'].astype('datetime64[D]').astype(np.int64)
+    never = np.iinfo(np.int64).max
+    
+    for event_type, column in MILESTONE_EVENTS.items():
+        selected = events['event_type'] == event_type
+        positions = order[np.searchsorted(user_ids, events['user_id'][selected], sorter=order)]
         
-        # Calculate days to each milestone
-        days_to_activation = (activation_date - signup_date).days if activation_date else None
-        days_to_pql = (pql_date - signup_date).days if pql_date else None
-        days_to_payment = (payment_date - signup_date).days if payment_date else None
+        # Earliest event per user, unbuffered so repeated events are handled
+        first_day = np.full(len(user_ids), never, dtype=np.int64)
+        np.minimum.at(first_day, positions, event_days[selected])
         
-        cohort_data.append((
-            user_id,
-            cohort_date,
-            signup_date,
-            activation_date,
-            feature_date,
-            pql_date,
-            payment_date,
-            days_to_activation,
-            days_to_pql,
-            days_to_payment
-        ))
-    
-    # Insert in batches
-    batch_size = 5000
-    for i in range(0, len(cohort_data), batch_size):
-        batch = cohort_data[i:i+batch_size]
-        cursor.executemany("""
-            INSERT INTO fact_cohort_data (user_id, cohort_date, signup_date, activation_date, feature_adoption_date, 
-                                          pql_date, payment_date, days_to_activation, days_to_pql, days_to_payment)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, batch)
-        connection.commit()
-    
-    cursor.close()
-    print(f"✅ Generated cohort analysis data ({len(cohort_data):,} records)!")
-
-def print_statistics(connection):
-    """Print final database statistics"""
-    print("\n" + "="*60)
-    print("📊 DATABASE STATISTICS")
-    print("="*60)
+        dates = first_day.astype('datetime64[D]')
+        dates[first_day == never] = np.datetime64('NaT')
+        milestones[column] = dates
     
-    cursor = connection.cursor()
+    return milestones
+
+def cohort_columns(milestones):
+    """Build fact_cohort_data columns from per-user milestone dates"""
+    signup_dates = milestones['signup_date']
+    
+    # Cohort = signup week (1970-01-01 was a Thursday, weekday 3)
+    signup_days = signup_dates.astype(np.int64)
+    cohort_dates = (signup_days - (signup_days + 3) % 7).astype('datetime64[D]')
+    
+    def days_since_signup(dates):
+        days = (dates - signup_dates).astype(np.int64)
+        return np.where(np.isnat(dates), None, days)
+    
+    return {
+        'user_id': milestones['user_id'],
+        'cohort_date': cohort_dates,
+        'signup_date': signup_dates,
+        'activation_date': milestones['activation_date'],
+        'feature_adoption_date': milestones['feature_adoption_date'],
+        'pql_date': milestones['pql_date'],
+        'payment_date': milestones['payment_date'],
+        'days_to_activation': days_since_signup(milestones['activation_date']),
+        'days_to_pql': days_since_signup(milestones['pql_date']),
+        'days_to_payment': days_since_signup(milestones['payment_date']),
+    }
+
+def load_milestones(cursor):
+    """Aggregate milestone dates for all users with one set-based query"""
+    users = load_users(cursor)
     
-    tables_stats = [
-        ('dim_users', 'Total Users'),
-        ('fact_user_events', 'Total Events'),
-        ('fact_ab_tests', 'Total A/B Test Assignments'),
-        ('fact_cohort_data', 'Total Cohort Records')
-    ]
+    cursor.execute("""
+        SELECT user_id, event_type, MIN(event_timestamp) FROM fact_user_events
+        WHERE event_type IN ('activation', 'feature_use', 'pql_qualified', 'payment_complete')
+        GROUP BY user_id, event_type
+    """)
+    firsts = cursor.fetchall()
+    
+    events = {
+        'user_id': np.array([row[0] for row in firsts], dtype=np.int64),
+        'event_type': np.array([row[1] for row in firsts], dtype=object),
+        'event_timestamp': np.array([row[2] for row in firsts], dtype='datetime64[s]'),
+    }
+    return summarize_milestones(users['user_id'], users['signup_date'], events)
+
+@traced
+def generate_cohort_data(sink, milestones=None, chunk_size=CHUNK_SIZE):
+    """Generate cohort analysis data
+
+    Uses the milestones returned by generate_user_events when given,
+    otherwise aggregates them from fact_user_events in a single query.
+    """
+    print(f"\n🔄 Generating cohort analysis data...")
     
-    for table, label in tables_stats:
-        cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        count = cursor.fetchone()[0]
-        print(f"✅ {label}: {count:,} records")
+    if milestones is None:
+        milestones = load_milestones(database_cursor(sink, 'milestones'))
     
-    print("\n📈 KEY METRICS:")
+    count = 0
+    for start in range(0, len(milestones['user_id']), chunk_size):
+        chunk = {column: values[start:start + chunk_size] for column, values in milestones.items()}
+        count += sink.write('fact_cohort_data', cohort_columns(chunk))
+    print(f"✅ Generated cohort analysis data ({count:,} records)!")
+
+def shard_ranges(num_users, num_shards, first_user_id=1):
+    """Split users into contiguous (first_user_id, num_users) ranges"""
+    bounds = np.linspace(0, num_users, num_shards + 1).astype(np.int64)
+    return [(first_user_id + int(lo), int(hi - lo)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def simulate_chunk(user_ids, rng, pool, ab_test_cutoff, profile=DEFAULT_PROFILE):
+    """Simulate every table for one chunk of users"""
+    users = simulate_users(user_ids, rng, pool, profile['signup_start'], profile['signup_days'])
+    events = simulate_user_events(user_ids, users['signup_date'], rng, profile)
+    milestones = summarize_milestones(user_ids, users['signup_date'], events)
+    ab_tests = simulate_ab_tests(user_ids[user_ids < ab_test_cutoff], rng, profile['ab_test_start'],
+                                 profile['ab_test_days'], profile['ab_test_end'])
+    
+    return {
+        'dim_users': users,
+        'fact_user_events': events,
+        'fact_ab_tests': ab_tests,
+        'fact_cohort_data': cohort_columns(milestones),
+    }
+
+def generate_chunk(shard_index, chunk_index, first_user_id, num_users, seed=SEED, ab_test_cutoff=None,
+                   profile=DEFAULT_PROFILE):
+    """Simulate one chunk of a shard's contiguous user_id range
+
+    May run in a worker process. All randomness comes from a generator
+    seeded with (seed, shard_index, chunk_index, first_user_id), so the
+    output never depends on which process ran it or on the other chunks,
+    and appended slices never replay the random streams of earlier ones.
+    """
+    chunk_rng = np.random.default_rng([seed, shard_index, chunk_index, first_user_id])
+    user_ids = np.arange(first_user_id, first_user_id + num_users, dtype=np.int64)
+    if ab_test_cutoff is None:
+        ab_test_cutoff = first_user_id + num_users
+    
+    # Every chunk draws from the same pool, built from the base seed
+    return simulate_chunk(user_ids, chunk_rng, build_identity_pool(seed), ab_test_cutoff, profile)
+
+def plan_chunks(first_user_id, num_users, num_shards=1, chunk_size=CHUNK_SIZE, seed=SEED, ab_test_cutoff=None,
+                profile=DEFAULT_PROFILE):
+    """generate_chunk arguments covering every user, in user_id order"""
+    tasks = []
+    for shard_index, (shard_first, shard_users) in enumerate(shard_ranges(num_users, num_shards, first_user_id)):
+        for chunk_index, chunk_first in enumerate(range(shard_first, shard_first + shard_users, chunk_size)):
+            chunk_users = min(chunk_size, shard_first + shard_users - chunk_first)
+            tasks.append((shard_index, chunk_index, chunk_first, chunk_users, seed, ab_test_cutoff, profile))
+    return tasks
+
+def iter_chunks(tasks, processes=1, max_pending=4):
+    """Run generate_chunk tasks and yield their tables in task order
+
+    At most max_pending chunks are in flight beyond the workers' own, so
+    memory stays bounded however many users are generated.
+    """
+    if processes <= 1:
+        for task in tasks:
+            with span('simulate_chunk', users=task[3]):
+                tables = generate_chunk(*task)
+            yield tables
+        return
     
-    cursor.execute("""
-        SELECT 
-            SUM(CASE WHEN event_type = 'activation' THEN 1 ELSE 0 END) as activations,
-            SUM(CASE WHEN event_type = 'feature_use' THEN 1 ELSE 0 END) as feature_uses,
-            SUM(CASE WHEN event_type = 'pql_qualified' THEN 1 ELSE 0 END) as pqls,
-            SUM(CASE WHEN event_type = 'payment_complete' THEN 1 ELSE 0 END) as payments
-        FROM fact_user_events
-    """)
+    with multiprocessing.Pool(processes) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(generate_chunk, task))
+            if len(pending) >= processes + max_pending:
+                yield wait_for_chunk(pending.popleft())
+        while pending:
+            yield wait_for_chunk(pending.popleft())
+
+def wait_for_chunk(result):
+    """A worker's chunk, spanning the time spent waiting for it"""
+    with span('wait_chunk'):
+        return result.get()
+
+@traced
+def generate_dataset(sink, num_users=10000, seed=SEED, num_shards=1, processes=1,
+                     chunk_size=CHUNK_SIZE, max_pending=4, profile=DEFAULT_PROFILE):
+    """Stream every table to the sink chunk by chunk
+
+    Chunks are simulated (optionally across worker processes) while a
+    background thread writes the previous ones, so simulation and database
+    I/O overlap and peak memory is set by chunk_size and max_pending.
+    A given (seed, num_shards, chunk_size) always produces the same dataset.
+    """
+    print(f"\n🔄 Generating {num_users:,} users in {num_shards} shard(s) of {chunk_size:,}-user chunks...")
+    first_user_id = sink.next_user_id()
+    
+    # Same A/B population as the per-table stages: the profile's first share of users
+    cutoff = ab_test_cutoff(first_user_id, num_users, profile)
+    tasks = plan_chunks(first_user_id, num_users, num_shards, chunk_size, seed, cutoff, profile)
+    
+    writer = BackgroundWriter(sink, max_pending=max_pending)
+    counts = dict.fromkeys(TABLES, 0)
+    try:
+        for tables in iter_chunks(tasks, processes, max_pending):
+            # Chunks arrive in user_id order, users before their facts
+            for table in TABLES:
+                if len(tables[table]['user_id']):
+                    counts[table] += writer.write(table, tables[table])
+            print(f"   Generated {counts['dim_users']:,} users / {counts['fact_user_events']:,} events...")
+    finally:
+        writer.close()
     
-    activations, feature_uses, pqls, payments = cursor.fetchone()
+    for table in TABLES:
+        print(f"✅ Loaded {counts[table]:,} {table} rows")
+    return counts
+
+def split_columns(columns, parts):
+    """Split a table's column arrays into `parts` row slices"""
+    bounds = np.linspace(0, len(columns['user_id']), parts + 1).astype(np.int64)
+    return [{name: values[lo:hi] for name, values in columns.items()}
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+@traced
+def generate_parallel(sink_pool, num_users=10000, seed=SEED, num_shards=1, processes=1,
+                      chunk_size=CHUNK_SIZE, max_pending=4, insert_workers=2, profile=DEFAULT_PROFILE):
+    """Populate the tables with a DAG of concurrent stage tasks
+
+    Per chunk, dim_users is written first; fact_user_events (split across
+    insert_workers), fact_ab_tests and fact_cohort_data then only depend on
+    it and run concurrently, each task on its own pooled sink. Produces the
+    same rows as generate_dataset and prints the stage timeline.
+    """
+    print(f"\n🔄 Generating {num_users:,} users over {len(sink_pool.sinks)} pooled connection(s)...")
+    first_user_id = sink_pool.next_user_id()
+    cutoff = ab_test_cutoff(first_user_id, num_users, profile)
+    tasks = plan_chunks(first_user_id, num_users, num_shards, chunk_size, seed, cutoff, profile)
+    
+    scheduler = StageScheduler(max_workers=len(sink_pool.sinks))
+    counts = dict.fromkeys(TABLES, 0)
+    in_flight = collections.deque()
     
-    print(f"   Signups: 10,000")
-    print(f"   Activations: {activations:,} ({activations/100:.1f}%)")
-    print(f"   Feature Users: {feature_uses:,} ({feature_uses/100:.1f}%)")
-    print(f"   PQLs: {pqls:,} ({pqls/100:.1f}%)")
-    print(f"   Paid Customers: {payments:,} ({payments/100:.1f}%)")
+    try:
+        chunks = iter_chunks(tasks, processes, max_pending)
+        while True:
+            simulate_start = time.perf_counter()
+            tables = next(chunks, None)
+            if tables is None:
+                break
+            scheduler.record('simulate', simulate_start, time.perf_counter())
+            
+            users_written = scheduler.submit('dim_users', sink_pool.write, 'dim_users', tables['dim_users'])
+            futures = [users_written]
+            for table in TABLES[1:]:
+                parts = insert_workers if table == 'fact_user_events' else 1
+                for part in split_columns(tables[table], parts):
+                    futures.append(scheduler.submit(table, sink_pool.write, table, part, deps=[users_written]))
+            
+            for table in TABLES:
+                counts[table] += len(tables[table]['user_id'])
+            in_flight.append(futures)
+            
+            # Bound memory: wait for the oldest chunk once max_pending are in flight
+            while len(in_flight) > max_pending:
+                for future in in_flight.popleft():
+                    future.result()
+            print(f"   Generated {counts['dim_users']:,} users / {counts['fact_user_events']:,} events...")
+        
+        while in_flight:
+            for future in in_flight.popleft():
+                future.result()
+    finally:
+        scheduler.shutdown()
     
-    cursor.close()
+    for table in TABLES:
+        print(f"✅ Loaded {counts[table]:,} {table} rows")
+    print_timeline(scheduler.timeline, time.perf_counter() - scheduler.started)
+    return counts
+
+def append_profile(sink, days, profile=DEFAULT_PROFILE):
+    """Profile for the next `days` of signups after the sink's watermark
+
+    Only reads MAX(user_id) / MAX(signup_date), which the primary key and
+    idx_signup_date answer without scanning the existing tables.
+    """
+    max_user_id, max_signup_date = sink.watermark()
+    if max_signup_date is None:
+        print("\n📍 No existing users - appending from the profile's start date")
+        return profile
+    
+    signup_start = max_signup_date + np.timedelta64(1, 'D')
+    print(f"\n📍 Watermark: user_id {max_user_id:,} | last signup {max_signup_date}")
+    print(f"   Appending signups {signup_start} → {signup_start + np.timedelta64(days - 1, 'D')}")
+    
+    # New users join A/B tests that run over their own signup window
+    return dict(profile, signup_start=signup_start, signup_days=days, ab_test_start=signup_start,
+                ab_test_days=days, ab_test_end=signup_start + np.timedelta64(days - 1, 'D'))
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate PLG analytics sample data")
+    parser.add_argument('--profile', default='default',
+                        help=f"scale profile: {' / '.join(SCALE_PROFILES)} or a JSON file of overrides")
+    parser.add_argument('--users', type=int, default=None, help="number of users to generate (overrides the profile)")
+    parser.add_argument('--seed', type=int, default=SEED, help="base random seed")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split users into this many independently seeded shards")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes (default: one per shard, up to CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="users simulated per chunk")
+    parser.add_argument('--max-pending', type=int, default=4,
+                        help="chunks buffered ahead of the database writer")
+    parser.add_argument('--pool-size', type=int, default=0,
+                        help="run table stages concurrently over this many pooled MySQL connections")
+    parser.add_argument('--insert-workers', type=int, default=2,
+                        help="concurrent insert tasks per fact_user_events chunk in pooled mode")
+    parser.add_argument('--sink', default='insert',
+                        choices=['insert', 'multirow', 'loaddata', 'stage', 'sqlite', 'duckdb'],
+                        help="where rows go: MySQL executemany / multi-row INSERT / LOAD DATA, "
+                             "staged files only, or an embedded database file")
+    parser.add_argument('--stage-dir', default='plg_stage', help="directory for staged table files")
+    parser.add_argument('--db-path', default='plg_analytics.db', help="embedded database file")
+    parser.add_argument('--load-only', metavar='STAGE_DIR',
+                        help="re-ingest a previously staged dataset instead of generating")
+    parser.add_argument('--append', type=int, metavar='DAYS',
+                        help="append --users new users signing up in the DAYS after the current watermark")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a timing/memory trace of every stage and database write (Chrome trace JSON)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="with --trace, also record tracemalloc allocation peaks per stage")
+    parser.add_argument('--cprofile', metavar='FILE', help="profile the run with cProfile and save the stats")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        start_tracing(memory=args.trace_memory)
+    
+    with profiled(args.cprofile), span('generate_data', sink=args.sink):
+        run_generation(args)
+    
+    if args.trace:
+        write_trace(args.trace)
+        print_trace_summary()
+        print(f"\n🧭 Trace saved to: {args.trace} (open in chrome://tracing or ui.perfetto.dev)")
+
+def run_generation(args):
+    """Generate, append or load the dataset as the command line asks"""
     print("\n" + "="*60)
     print("🚀 PLG ANALYTICS - DATA GENERATION STARTING")
     print("="*60)
     
-    connection = connect_to_mysql()
-    if not connection:
-        print("\n❌ Failed to connect. Please check your MySQL connection.")
-        return
+    connection = None
+    connection_pool = None
+    pooled_connections = []
+    if args.sink in ('insert', 'multirow', 'loaddata'):
+        if args.pool_size > 1 and args.sink != 'loaddata':
+            connection_pool = open_connection_pool(args.pool_size)
+            connection = connection_pool.get_connection() if connection_pool else None
+        else:
+            connection = connect_to_mysql(allow_local_infile=args.sink == 'loaddata')
+        if not connection:
+            print("\n❌ Failed to connect. Please check your MySQL connection.")
+            return
+    
+    sink = open_sink(args.sink, connection=connection, path=args.db_path, stage_dir=args.stage_dir)
     
     try:
-        generate_users(connection, num_users=10000)
-        generate_user_events(connection, num_users=10000)
-        generate_ab_tests(connection, num_users=10000)
-        generate_cohort_data(connection, num_users=10000)
-        print_statistics(connection)
+        profile = load_profile(args.profile)
+        num_users = args.users or profile['users']
+        if args.append:
+            profile = append_profile(sink, args.append, profile)
+        
+        if args.load_only:
+            print(f"\n🔄 Loading staged dataset from {args.load_only}...")
+            load_staged(sink, args.load_only)
+        elif args.pool_size > 0:
+            # Embedded and file sinks share one sink; MySQL gets a connection per worker
+            sinks = [sink]
+            if connection_pool is not None:
+                pooled_connections = [connection_pool.get_connection() for _ in range(args.pool_size - 1)]
+                sinks += [open_sink(args.sink, connection=pooled) for pooled in pooled_connections]
+            processes = args.processes or min(args.shards, os.cpu_count() or 1)
+            generate_parallel(SinkPool(sinks), num_users=num_users, seed=args.seed, num_shards=args.shards,
+                              processes=processes, chunk_size=args.chunk_size, max_pending=args.max_pending,
+                              insert_workers=args.insert_workers, profile=profile)
+        else:
+            processes = args.processes or min(args.shards, os.cpu_count() or 1)
+            generate_dataset(sink, num_users=num_users, seed=args.seed, num_shards=args.shards,
+                             processes=processes, chunk_size=args.chunk_size, max_pending=args.max_pending,
+                             profile=profile)
+        sink.flush()
+        
+        if args.append:
+            # Full-table statistics would rescan everything the append avoided
+            print(f"\n✅ Appended a {args.append}-day slice of {num_users:,} users")
+        elif sink.connection is not None:
+            print_statistics(sink.connection)
+        else:
+            print(f"\n📁 Staged dataset written to: {args.stage_dir}")
         
         print("\n" + "="*60)
         print("🎉 DATA GENERATION COMPLETED SUCCESSFULLY!")
@@ -372,9 +760,14 @@ def main():
         print(f"\n❌ Error during data generation: {e}")
         import traceback
         traceback.print_exc()
-        connection.rollback()
+        if sink.connection is not None:
+            sink.connection.rollback()
     finally:
-        connection.close()
+        sink.close()
+        for pooled in pooled_connections:
+            pooled.close()
+        if connection is not None:
+            connection.close()
         print("\n🔒 Database connection closed.")
 
 if __name__ == "__main__":
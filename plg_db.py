@@ -0,0 +1,133 @@
+import configparser
+import os
+from plg_trace import traced
+
+# MySQL connection settings: these defaults, overridden by the [mysql] section
+# of the config file, overridden by PLG_DB_* environment variables
+# (PLG_DB_HOST, PLG_DB_PORT, PLG_DB_USER, PLG_DB_PASSWORD, PLG_DB_DATABASE)
+DB_DEFAULTS = {
+    'host': 'localhost',
+    'port': '3306',
+    'user': 'root',
+    'password': '',
+    'database': 'plg_analytics',
+    'charset': 'utf8mb4'
+}
+CONFIG_FILE = 'plg.ini'
+CONFIG_ENV = 'PLG_CONFIG'
+ENV_PREFIX = 'PLG_DB_'
+
+# Only the standard library is imported here: every command line tool reads its
+# settings through this module, and the stats command needs nothing more
+
+def db_config():
+    """MySQL connection settings from the config file ($PLG_CONFIG or plg.ini) and environment
+
+    Keys the [mysql] section adds beyond DB_DEFAULTS (ssl_ca, ...) are
+    passed to mysql.connector as they are.
+    """
+    config = dict(DB_DEFAULTS)
+    path = os.environ.get(CONFIG_ENV, CONFIG_FILE)
+    if CONFIG_ENV in os.environ and not os.path.exists(path):
+        raise FileNotFoundError(f"{CONFIG_ENV} points to a missing file: {path}")
+    if os.path.exists(path):
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read(path, encoding='utf-8')
+        if parser.has_section('mysql'):
+            config.update(parser['mysql'])
+    for key in DB_DEFAULTS:
+        if ENV_PREFIX + key.upper() in os.environ:
+            config[key] = os.environ[ENV_PREFIX + key.upper()]
+    config['port'] = int(config['port'])
+    return config
+
+def connect(backend='mysql', db_path=None, **options):
+    """DB-API connection to MySQL (db_config) or to the generator's embedded SQLite/DuckDB file"""
+    if backend == 'mysql':
+        import mysql.connector
+        return mysql.connector.connect(**db_config(), **options)
+    if backend == 'duckdb':
+        import duckdb
+        return duckdb.connect(db_path, read_only=True)
+    import sqlite3
+    return sqlite3.connect(db_path)
+
+def connection_backend(connection):
+    """'mysql', 'sqlite' or 'duckdb': the backend a DB-API connection talks to"""
+    module = type(connection).__module__
+    if module.startswith('sqlite3'):
+        return 'sqlite'
+    return 'duckdb' if 'duckdb' in module else 'mysql'
+
+def source_identity(connection):
+    """The database a connection reads: backend plus resolved file path, or MySQL host:port/database
+
+    Stored next to anything derived from the tables (snapshots, aggregate
+    state) so it is never reused for another database.
+    """
+    backend = connection_backend(connection)
+    cursor = connection.cursor()
+    if backend == 'sqlite':
+        cursor.execute("PRAGMA database_list")
+        path = next(row[2] for row in cursor.fetchall() if row[1] == 'main')
+        database = os.path.realpath(path) if path else ':memory:'
+    elif backend == 'duckdb':
+        cursor.execute("SELECT path FROM duckdb_databases() WHERE database_name = current_database()")
+        path = cursor.fetchone()[0]
+        database = os.path.realpath(path) if path else ':memory:'
+    else:
+        cursor.execute("SELECT @@hostname, @@port, DATABASE()")
+        host, port, name = cursor.fetchone()
+        database = f"{host}:{port}/{name}"
+    cursor.close()
+    return f"{backend}:{database}"
+
+@traced
+def print_statistics(connection):
+    """Print final database statistics"""
+    print("\n" + "="*60)
+    print("📊 DATABASE STATISTICS")
+    print("="*60)
+
+    cursor = connection.cursor()
+
+    tables_stats = [
+        ('dim_users', 'Total Users'),
+        ('fact_user_events', 'Total Events'),
+        ('fact_ab_tests', 'Total A/B Test Assignments'),
+        ('fact_cohort_data', 'Total Cohort Records')
+    ]
+
+    counts = {}
+    for table, label in tables_stats:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+        print(f"✅ {label}: {counts[table]:,} records")
+
+    print("\n📈 KEY METRICS:")
+
+    # feature_use repeats per session, so adoption counts distinct users
+    cursor.execute("""
+        SELECT
+            SUM(CASE WHEN event_type = 'activation' THEN 1 ELSE 0 END) as activations,
+            COUNT(DISTINCT CASE WHEN event_type = 'feature_use' THEN user_id END) as feature_users,
+            SUM(CASE WHEN event_type = 'feature_use' THEN 1 ELSE 0 END) as feature_sessions,
+            SUM(CASE WHEN event_type = 'pql_qualified' THEN 1 ELSE 0 END) as pqls,
+            SUM(CASE WHEN event_type = 'payment_complete' THEN 1 ELSE 0 END) as payments
+        FROM fact_user_events
+    """)
+
+    activations, feature_users, feature_sessions, pqls, payments = [value or 0 for value in cursor.fetchone()]
+    signups = counts['dim_users']
+    percent = 100 / signups if signups else 0
+
+    print(f"   Signups: {signups:,}")
+    print(f"   Activations: {activations:,} ({activations * percent:.1f}%)")
+    print(f"   Feature Users: {feature_users:,} ({feature_users * percent:.1f}%)")
+    print(f"   PQLs: {pqls:,} ({pqls * percent:.1f}%)")
+    print(f"   Paid Customers: {payments:,} ({payments * percent:.1f}%)")
+    if activations:
+        print(f"   Events / Active User: {counts['fact_user_events'] / activations:.1f} "
+              f"({feature_sessions:,} feature sessions)")
+
+    cursor.close()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from plg_cohorts import user_rows
+from plg_funnel import STAGE_BITS
+from plg_metadata import EVENT_METADATA, FEATURES, METADATA_FIELDS
+
+FEATURE_BITS = {feature: np.uint8(1 << bit) for bit, feature in enumerate(FEATURES)}
+
+def decode_metadata(metadata_ids, fields=METADATA_FIELDS):
+    """Typed columns for a batch of metadata_ids, one Categorical per field
+
+    Each field is resolved once per dictionary entry into a code table, so
+    a batch costs one integer take per field - no JSON is parsed. Rows
+    without a payload (unknown ids) or without the field are missing.
+    """
+    ids = np.asarray(metadata_ids, dtype=np.int64)
+    ids = np.where((ids > 0) & (ids <= len(EVENT_METADATA)), ids, 0)
+    decoded = {}
+    for field in fields:
+        values = [None] + [payload.get(field) for payload in EVENT_METADATA]
+        categories = list(dict.fromkeys(value for value in values if value is not None))
+        codes = np.array([-1 if value is None else categories.index(value) for value in values], dtype=np.int8)
+        decoded[field] = pd.Categorical.from_codes(codes[ids], categories=categories)
+    return pd.DataFrame(decoded)
+
+def event_features(events):
+    """FEATURES index of each feature_use event's feature, -1 for other rows"""
+    codes = np.asarray(decode_metadata(events['metadata_id'].to_numpy(), ['feature'])['feature'].cat.codes)
+    return np.where((events['event_type'] == 'feature_use').to_numpy(), codes, -1)
+
+def feature_bitmask(users, events, out=None):
+    """Per-user uint8 with bit k set when the user used FEATURES[k]
+
+    Like stage_bitmask: one OR per feature_use event, and with out a batch
+    of events is ORed into an existing bitmask in place.
+    """
+    mask = np.zeros(len(users), dtype=np.uint8) if out is None else out
+    if not len(users) or not len(events):
+        return mask
+    features = event_features(events)
+    rows = user_rows(users, events['user_id'].to_numpy())
+    selected = (features >= 0) & (rows >= 0)
+    np.bitwise_or.at(mask, rows[selected], (1 << features[selected]).astype(np.uint8))
+    return mask
+
+def feature_sessions(events):
+    """feature_use events per feature"""
+    features = event_features(events)
+    sessions = np.bincount(features[features >= 0], minlength=len(FEATURES))
+    return pd.DataFrame({'feature': FEATURES, 'sessions': sessions.astype(np.int64)})
+
+def feature_cells(features, stages):
+    """Users per (set of features used, reached PQL, paid) - for users who used any feature"""
+    used = features > 0
+    cells = pd.DataFrame({
+        'feature_mask': features[used].astype(np.int64),
+        'pql': ((stages[used] & STAGE_BITS['pql_qualified']) > 0).astype(np.int64),
+        'paid': ((stages[used] & STAGE_BITS['payment_complete']) > 0).astype(np.int64)
+    })
+    return cells.groupby(['feature_mask', 'pql', 'paid']).size().rename('users').reset_index()
+
+def feature_cells_query():
+    """SQL computing feature_cells inside the database, joined through dim_event_metadata"""
+    bits = " +\n".join(f"            MAX(CASE WHEN m.feature = '{feature}' THEN {int(bit)} ELSE 0 END)"
+                       for feature, bit in FEATURE_BITS.items())
+    return f"""
+SELECT s.feature_mask, s.pql, s.paid, COUNT(*) AS users
+FROM (
+    SELECT e.user_id,
+{bits} AS feature_mask,
+        MAX(CASE WHEN e.event_type = 'pql_qualified' THEN 1 ELSE 0 END) AS pql,
+        MAX(CASE WHEN e.event_type = 'payment_complete' THEN 1 ELSE 0 END) AS paid
+    FROM fact_user_events e
+    LEFT JOIN dim_event_metadata m ON m.metadata_id = e.metadata_id AND e.event_type = 'feature_use'
+    GROUP BY e.user_id
+) s
+WHERE s.feature_mask > 0
+GROUP BY s.feature_mask, s.pql, s.paid"""
+
+FEATURE_SESSIONS_QUERY = """
+SELECT m.feature, COUNT(*) AS sessions
+FROM fact_user_events e
+JOIN dim_event_metadata m ON m.metadata_id = e.metadata_id
+WHERE e.event_type = 'feature_use' AND m.feature IS NOT NULL
+GROUP BY m.feature"""
+
+def feature_adoption(cells, sessions):
+    """(per feature, per number of features used) adopters with their PQL and paid rates
+
+    PQL lift compares a feature's adopters with the adopters of any
+    feature, so > 1 marks features whose users qualify more often.
+    """
+    cells = cells.astype(np.int64)
+    masks = cells['feature_mask'].to_numpy()
+    adopters = cells['users'].sum()
+    pql_rate = (cells['users'] * cells['pql']).sum() / adopters * 100 if adopters else np.nan
+
+    rows = []
+    for feature, bit in FEATURE_BITS.items():
+        selected = cells[(masks & int(bit)) > 0]
+        users = int(selected['users'].sum())
+        pql = int((selected['users'] * selected['pql']).sum())
+        paid = int((selected['users'] * selected['paid']).sum())
+        rows.append({'feature': feature, 'users': users, 'pql_users': pql, 'paid_users': paid})
+    by_feature = pd.DataFrame(rows).set_index('feature')
+    by_feature['sessions'] = sessions.set_index('feature')['sessions'].reindex(by_feature.index, fill_value=0)
+    by_feature['sessions'] = by_feature['sessions'].astype(np.int64)
+
+    breadth = cells.assign(features_used=[bin(mask).count('1') for mask in masks])
+    breadth = breadth.assign(pql_users=breadth['users'] * breadth['pql'], paid_users=breadth['users'] * breadth['paid'])
+    breadth = breadth.groupby('features_used')[['users', 'pql_users', 'paid_users']].sum()
+
+    for table in (by_feature, breadth):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['pql_rate'] = table['pql_users'] / table['users'] * 100
+            table['paid_rate'] = table['paid_users'] / table['users'] * 100
+    by_feature['pql_lift'] = by_feature['pql_rate'] / pql_rate
+    return by_feature, breadth
@@ -0,0 +1,116 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+# Funnel stages in order: (label, event_type). Every dim_users row counts as a signup.
+FUNNEL_STAGES = [
+    ('Signup', 'signup'),
+    ('Activation', 'activation'),
+    ('Feature Use', 'feature_use'),
+    ('PQL Qualified', 'pql_qualified'),
+    ('Paid', 'payment_complete')
+]
+STAGE_LABELS = [label for label, _ in FUNNEL_STAGES]
+STAGE_BITS = {event_type: np.uint8(1 << bit) for bit, (_, event_type) in enumerate(FUNNEL_STAGES)}
+
+# dim_users columns the funnel is broken down by
+FUNNEL_DIMENSIONS = ['user_segment', 'device_type', 'platform']
+
+def stage_bitmask(users, events, out=None):
+    """Per-user funnel state in one pass over the events
+
+    Returns a uint8 per users row with bit k set when the user reached
+    stage k. event_type maps to its bit through the category codes and
+    user_id to its row through a dense lookup table, so repeated events
+    (e.g. feature_use sessions) cost one OR each and nothing more. With
+    out, a batch of events is ORed into an existing bitmask in place.
+    """
+    user_ids = users['user_id'].to_numpy()
+    mask = np.full(len(user_ids), STAGE_BITS['signup'], dtype=np.uint8) if out is None else out
+    if not len(user_ids) or not len(events):
+        return mask
+
+    rows = np.full(int(user_ids.max()) + 1, -1, dtype=np.int64)
+    rows[user_ids] = np.arange(len(user_ids))
+
+    event_types = events['event_type'].astype('category')
+    category_bits = np.array([STAGE_BITS.get(event_type, 0) for event_type in event_types.cat.categories]
+                             + [0], dtype=np.uint8)  # code -1 (missing) maps to the trailing 0
+    bits = category_bits[event_types.cat.codes.to_numpy()]
+
+    # Events of users outside the loaded users map to row -1 and are skipped
+    event_users = events['user_id'].to_numpy()
+    event_rows = np.full(len(event_users), -1, dtype=np.int64)
+    in_range = (event_users >= 0) & (event_users < len(rows))
+    event_rows[in_range] = rows[event_users[in_range]]
+    selected = (event_rows >= 0) & (bits > 0)
+    np.bitwise_or.at(mask, event_rows[selected], bits[selected])
+    return mask
+
+def stage_flags(mask):
+    """0/1 column per funnel stage from the bitmask"""
+    return pd.DataFrame({label: (mask >> bit) & 1 for bit, label in enumerate(STAGE_LABELS)}, dtype=np.int64)
+
+def funnel_breakdown(users, mask, dimensions=()):
+    """Users reaching each stage per combination of dimension values"""
+    flags = stage_flags(mask)
+    if not dimensions:
+        return flags.sum().to_frame().T
+    for dimension in dimensions:
+        flags[dimension] = users[dimension].to_numpy()
+    return flags.groupby(list(dimensions), observed=True).sum()
+
+def funnel_cells_query(dimensions=FUNNEL_DIMENSIONS):
+    """SQL computing the finest funnel_breakdown cells inside the database
+
+    Per-user stage flags come from one GROUP BY over fact_user_events, then
+    users are counted per dimension cell - only the cells leave the server.
+    """
+    flags = ",\n".join(f"        MAX(CASE WHEN event_type = '{event_type}' THEN 1 ELSE 0 END) AS s{bit}"
+                       for bit, (_, event_type) in enumerate(FUNNEL_STAGES) if bit)
+    sums = ",\n".join(f"    COALESCE(SUM(s.s{bit}), 0) AS s{bit}" for bit in range(1, len(FUNNEL_STAGES)))
+    columns = ", ".join(f"u.{dimension}" for dimension in dimensions)
+    return f"""
+SELECT {columns},
+    COUNT(*) AS s0,
+{sums}
+FROM dim_users u
+LEFT JOIN (
+    SELECT user_id,
+{flags}
+    FROM fact_user_events
+    GROUP BY user_id
+) s ON s.user_id = u.user_id
+GROUP BY {columns}"""
+
+def cells_frame(rows, dimensions=FUNNEL_DIMENSIONS):
+    """funnel_cells_query result as a funnel_breakdown-style frame"""
+    rows = rows.rename(columns={f"s{bit}": label for bit, label in enumerate(STAGE_LABELS)})
+    return rows.astype({label: np.int64 for label in STAGE_LABELS}).set_index(list(dimensions)).sort_index()
+
+def funnel_cube(finest, dimensions=FUNNEL_DIMENSIONS):
+    """Breakdowns for every subset of dimensions, from the finest cells
+
+    Only the finest breakdown (funnel_breakdown or funnel_cells_query)
+    touches per-user rows; every coarser one is rolled up from its cells,
+    so the whole cube costs one pass.
+    """
+    cube = {}
+    for size in range(len(dimensions) + 1):
+        for combination in itertools.combinations(dimensions, size):
+            if combination:
+                cube[combination] = finest.groupby(level=list(combination), observed=True).sum()
+            else:
+                cube[combination] = finest.sum().to_frame().T
+    return cube
+
+def waterfall(counts):
+    """(stage, users, step conversion %, drop-off %) for one row of stage counts"""
+    steps = []
+    previous = None
+    for label in STAGE_LABELS:
+        count = int(counts[label])
+        conversion = count / previous * 100 if previous else 100.0
+        steps.append((label, count, conversion, 100 - conversion))
+        previous = count
+    return steps
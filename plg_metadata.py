@@ -0,0 +1,29 @@
+import json
+import numpy as np
+
+FEATURES = ['dashboard_view', 'analytics_report', 'data_export', 'automation_setup']
+
+# dim_event_metadata: every distinct event payload, stored once. fact_user_events
+# rows reference it by metadata_id (position + 1) instead of repeating the JSON.
+EVENT_METADATA = [
+    {'source': 'web', 'plan': 'free'},
+    {'event': 'completed_onboarding'},
+    {'pql_reason': 'high_usage_score'},
+    {'plan': 'pro', 'payment_method': 'credit_card'},
+] + [{'feature': feature} for feature in FEATURES]
+# Typed dim_event_metadata columns, one per payload key
+METADATA_FIELDS = ['source', 'plan', 'event', 'feature', 'pql_reason', 'payment_method']
+
+# JSON document per metadata_id; id 0 (no payload) is null
+METADATA_JSON = np.array(['null'] + [json.dumps(payload) for payload in EVENT_METADATA], dtype=object)
+
+def metadata_id(payload):
+    return EVENT_METADATA.index(payload) + 1
+
+def metadata_rows():
+    """dim_event_metadata as column arrays: id, typed fields and the JSON payload"""
+    rows = {'metadata_id': np.arange(1, len(EVENT_METADATA) + 1, dtype=np.int16)}
+    for field in METADATA_FIELDS:
+        rows[field] = np.array([payload.get(field) for payload in EVENT_METADATA], dtype=object)
+    rows['metadata'] = METADATA_JSON[1:]
+    return rows
@@ -0,0 +1,260 @@
+import argparse
+import sys
+import time
+import numpy as np
+from plg_data_generator import (SEED, DEFAULT_PROFILE, SCALE_PROFILES, build_identity_pool, connect_to_mysql,
+                                load_profile, simulate_user_events, simulate_users)
+from plg_metadata import METADATA_JSON
+from plg_sinks import open_sink
+
+# Seconds between throughput / lag reports
+REPORT_INTERVAL = 5.0
+
+# ==========================================
+# 1. TIME-ORDERED EVENT STREAM
+# ==========================================
+
+def day_streams(first_user_id, num_users, seed=SEED, profile=DEFAULT_PROFILE):
+    """Simulate users one signup day at a time
+
+    Yields (day_start, users, events) with each day's events sorted by
+    timestamp. Signup counts per day follow the same uniform model as
+    generate_dataset; user_ids are assigned in signup order.
+    """
+    rng = np.random.default_rng([seed, first_user_id])
+    days = profile['signup_days']
+    users_per_day = rng.multinomial(num_users, np.full(days, 1 / days))
+    pool = build_identity_pool(seed)
+
+    next_user_id = first_user_id
+    for day, count in enumerate(users_per_day):
+        day_start = profile['signup_start'] + np.timedelta64(day, 'D')
+        user_ids = np.arange(next_user_id, next_user_id + count, dtype=np.int64)
+        next_user_id += count
+
+        users = simulate_users(user_ids, rng, pool, day_start, 1)
+        events = simulate_user_events(user_ids, users['signup_date'], rng, profile)
+        order = np.argsort(events['event_timestamp'], kind='stable')
+        yield day_start, users, {column: values[order] for column, values in events.items()}
+
+def merge_before(streams, boundary):
+    """Pop every event before `boundary` from the sorted streams, merged in time order"""
+    parts = []
+    for stream in streams:
+        cut = np.searchsorted(stream['event_timestamp'], boundary, side='left') if boundary is not None \
+            else len(stream['event_timestamp'])
+        if cut:
+            parts.append({column: values[:cut] for column, values in stream.items()})
+            for column in stream:
+                stream[column] = stream[column][cut:]
+    streams[:] = [stream for stream in streams if len(stream['event_timestamp'])]
+
+    if not parts:
+        return None
+    merged = {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+    order = np.argsort(merged['event_timestamp'], kind='stable')
+    return {column: values[order] for column, values in merged.items()}
+
+def replay_events(first_user_id, num_users, seed=SEED, profile=DEFAULT_PROFILE, on_users=None):
+    """Yield blocks of events in global timestamp order
+
+    A k-way merge over the per-day journey streams: nothing from a later
+    signup day can happen before that day starts, so at each day boundary
+    every earlier event is final. Only journeys still in progress (about
+    two months of signups) are held in memory. on_users(users) is called
+    before any event of those users is yielded.
+    """
+    active = []
+    for day_start, users, events in day_streams(first_user_id, num_users, seed, profile):
+        block = merge_before(active, day_start)
+        if block is not None:
+            yield block
+        if on_users is not None:
+            on_users(users)
+        active.append(events)
+
+    block = merge_before(active, None)
+    if block is not None:
+        yield block
+
+# ==========================================
+# 2. PACING & REPORTING
+# ==========================================
+
+class Pacer:
+    """Throttle emission to a target events/s and track throughput and lag
+
+    Lag is how far (in seconds) emission has fallen behind the schedule
+    implied by the target rate; it stays 0 when running as fast as possible.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate or None
+        self.started = time.perf_counter()
+        self.emitted = 0
+        self.max_lag = 0.0
+        self.last_report = self.started
+        self.last_emitted = 0
+
+    def wait(self):
+        """Sleep until the next event is due"""
+        if self.rate is None:
+            return
+        if self.emitted == 0:
+            # The schedule starts with the first event, not with simulation warm-up
+            self.started = self.last_report = time.perf_counter()
+        due = self.started + self.emitted / self.rate
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        else:
+            self.max_lag = max(self.max_lag, now - due)
+
+    def lag(self):
+        if self.rate is None:
+            return 0.0
+        return max(0.0, time.perf_counter() - (self.started + self.emitted / self.rate))
+
+    def advance(self, count, last_timestamp):
+        self.emitted += count
+        now = time.perf_counter()
+        if now - self.last_report >= REPORT_INTERVAL:
+            window_rate = (self.emitted - self.last_emitted) / (now - self.last_report)
+            log(f"   {self.emitted:,} events | {window_rate:,.0f} events/s | "
+                f"lag {self.lag():.2f}s | event time {last_timestamp}")
+            self.last_report = now
+            self.last_emitted = self.emitted
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        log("\n" + "="*60)
+        log("📡 REPLAY SUMMARY")
+        log("="*60)
+        log(f"  Events: {self.emitted:,} in {elapsed:.2f}s")
+        log(f"  Sustained Throughput: {self.emitted / elapsed if elapsed else 0:,.0f} events/s"
+            + (f" (target {self.rate:,.0f})" if self.rate else " (unthrottled)"))
+        log(f"  Max Lag: {self.max_lag:.3f}s | Final Lag: {self.lag():.3f}s")
+
+def log(message):
+    # Status goes to stderr so NDJSON on stdout stays clean
+    print(message, file=sys.stderr)
+
+# ==========================================
+# 3. OUTPUT TARGETS
+# ==========================================
+
+class NdjsonTarget:
+    """Write events as one JSON object per line"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def users(self, users):
+        pass
+
+    def events(self, block):
+        timestamps = np.datetime_as_string(block['event_timestamp'], unit='s')
+        # Each metadata_id's JSON is serialized once in the dictionary - embed it as is
+        metadata = METADATA_JSON[block['metadata_id']]
+        lines = [f'{{"user_id": {user_id}, "event_type": "{event_type}", "event_timestamp": "{timestamp}", '
+                 f'"event_value": {event_value}, "metadata": {payload}}}\n'
+                 for user_id, event_type, timestamp, event_value, payload in zip(
+                     block['user_id'].tolist(), block['event_type'], timestamps,
+                     block['event_value'].tolist(), metadata)]
+        self.stream.write(''.join(lines))
+
+    def close(self):
+        self.stream.flush()
+
+class SinkTarget:
+    """Write users and the ordered events through a generator sink"""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def users(self, users):
+        self.sink.write('dim_users', users)
+
+    def events(self, block):
+        self.sink.write('fact_user_events', block)
+
+    def close(self):
+        self.sink.close()
+
+def replay(target, num_users=10000, seed=SEED, rate=None, first_user_id=1, limit=None,
+           profile=DEFAULT_PROFILE):
+    """Stream the simulated event feed to a target at `rate` events/s (None = max)"""
+    log(f"\n📡 Replaying events for {num_users:,} users at "
+        + (f"{rate:,.0f} events/s..." if rate else "full speed..."))
+
+    pacer = Pacer(rate)
+    # Small batches keep throttled output smooth; unthrottled runs use whole blocks
+    batch_size = max(1, int(rate / 20)) if rate else None
+
+    for block in replay_events(first_user_id, num_users, seed, profile, on_users=target.users):
+        size = len(block['event_timestamp'])
+        for start in range(0, size, batch_size or size):
+            stop = min(start + (batch_size or size), size)
+            if limit is not None:
+                stop = min(stop, start + limit - pacer.emitted)
+            pacer.wait()
+            target.events({column: values[start:stop] for column, values in block.items()})
+            pacer.advance(stop - start, block['event_timestamp'][stop - 1])
+            if limit is not None and pacer.emitted >= limit:
+                pacer.summary()
+                return pacer
+    pacer.summary()
+    return pacer
+
+# ==========================================
+# 4. MAIN EXECUTION
+# ==========================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay simulated PLG events in timestamp order")
+    parser.add_argument('--profile', default='default',
+                        help=f"scale profile: {' / '.join(SCALE_PROFILES)} or a JSON file of overrides")
+    parser.add_argument('--users', type=int, default=None, help="number of users to simulate (overrides the profile)")
+    parser.add_argument('--seed', type=int, default=SEED, help="random seed")
+    parser.add_argument('--rate', type=float, default=0, help="events per second (0 = as fast as possible)")
+    parser.add_argument('--limit', type=int, default=None, help="stop after this many events")
+    parser.add_argument('--target', default='stdout',
+                        choices=['stdout', 'file', 'insert', 'multirow', 'sqlite', 'duckdb', 'stage'],
+                        help="NDJSON on stdout or to a file, or a generator sink")
+    parser.add_argument('--output', default='plg_events.ndjson', help="NDJSON file for --target file")
+    parser.add_argument('--db-path', default='plg_analytics.db', help="embedded database file")
+    parser.add_argument('--stage-dir', default='plg_stage', help="directory for staged table files")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    profile = load_profile(args.profile)
+
+    connection = None
+    first_user_id = 1
+    if args.target == 'stdout':
+        target = NdjsonTarget(sys.stdout)
+    elif args.target == 'file':
+        target = NdjsonTarget(open(args.output, 'w', encoding='utf-8'))
+    else:
+        if args.target in ('insert', 'multirow'):
+            connection = connect_to_mysql()
+            if not connection:
+                log("\n❌ Failed to connect. Please check your MySQL connection.")
+                return
+        sink = open_sink(args.target, connection=connection, path=args.db_path, stage_dir=args.stage_dir)
+        first_user_id = sink.next_user_id()
+        target = SinkTarget(sink)
+
+    try:
+        replay(target, num_users=args.users or profile['users'], seed=args.seed, rate=args.rate or None,
+               first_user_id=first_user_id, limit=args.limit, profile=profile)
+    except (BrokenPipeError, KeyboardInterrupt):
+        log("\n⏹️ Replay stopped.")
+    finally:
+        target.close()
+        if connection is not None:
+            connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+import os
+
+# Structured outputs written next to the text report (--report-formats)
+REPORT_FORMATS = ['json', 'csv', 'parquet']
+
+def flat_table(df):
+    """The DataFrame with its index as columns and string column names"""
+    if any(name is not None for name in df.index.names):
+        df = df.reset_index()
+    else:
+        df = df.reset_index(drop=True)
+    return df.rename(columns=str)
+
+def records(df):
+    """JSON-ready rows of a table (ISO dates, NaN as null)"""
+    return json.loads(flat_table(df).to_json(orient='records', date_format='iso', double_precision=15))
+
+class Report:
+    """Buffered report: the text lines plus the tables they were rendered from
+
+    Lines are echoed to the console as they come (echo=False silences
+    them) but nothing touches the disk until close, which opens each
+    output once:
+      text    - report_file
+      json    - <report stem>.json, every section's tables as records
+      csv     - <report stem>_tables/<table>.csv
+      parquet - <report stem>_tables/<table>.parquet (needs pyarrow)
+    """
+
+    def __init__(self, report_file, formats=(), echo=True):
+        unknown = set(formats) - set(REPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown report formats: {', '.join(sorted(unknown))}")
+        self.report_file = report_file
+        self.formats = [fmt for fmt in REPORT_FORMATS if fmt in formats]
+        self.echo = echo
+        self.lines = []
+        self.sections = {}
+        stem = os.path.splitext(report_file)[0]
+        self.json_file = stem + '.json'
+        self.table_dir = stem + '_tables'
+
+    def line(self, message, print_to_console=True):
+        if self.echo and print_to_console:
+            print(message)
+        self.lines.append(message)
+
+    def add_tables(self, section, tables):
+        """Record a section's tables ({name: DataFrame}) for the structured outputs"""
+        self.sections[section] = tables
+
+    def outputs(self):
+        """Paths written besides the text report"""
+        paths = [self.json_file] if 'json' in self.formats else []
+        if 'csv' in self.formats or 'parquet' in self.formats:
+            paths.append(self.table_dir)
+        return paths
+
+    def close(self):
+        with open(self.report_file, 'w', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in self.lines))
+
+        if 'json' in self.formats:
+            document = {section: {name: records(df) for name, df in tables.items()}
+                        for section, tables in self.sections.items()}
+            with open(self.json_file, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+
+        if 'csv' in self.formats or 'parquet' in self.formats:
+            os.makedirs(self.table_dir, exist_ok=True)
+            for tables in self.sections.values():
+                for name, df in tables.items():
+                    table = flat_table(df)
+                    path = os.path.join(self.table_dir, name)
+                    if 'csv' in self.formats:
+                        table.to_csv(path + '.csv', index=False)
+                    if 'parquet' in self.formats:
+                        table.to_parquet(path + '.parquet', index=False)
@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class StageScheduler:
+    """Run tasks on a thread pool as soon as their dependencies finish
+
+    Every task belongs to a named stage; start/end times are recorded so
+    print_timeline() can show how much the stages overlapped.
+    """
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plg-stage')
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.timeline = []  # (stage, start, end) relative to self.started
+
+    def submit(self, stage, fn, *args, deps=()):
+        """Schedule fn(*args) once every future in deps has succeeded"""
+        future = Future()
+        remaining = [len(deps)]
+
+        def launch():
+            inner = self.executor.submit(self._timed, stage, fn, *args)
+            inner.add_done_callback(lambda done: _forward(done, future))
+
+        def on_dependency(dependency):
+            with self.lock:
+                if future.done():
+                    return
+                if dependency.exception() is not None:
+                    future.set_exception(dependency.exception())
+                    return
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                launch()
+
+        if not deps:
+            launch()
+        for dependency in deps:
+            dependency.add_done_callback(on_dependency)
+        return future
+
+    def record(self, stage, start, end):
+        with self.lock:
+            self.timeline.append((stage, start - self.started, end - self.started))
+
+    def _timed(self, stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.record(stage, start, time.perf_counter())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+def _forward(source, target):
+    exception = source.exception()
+    if target.done():
+        return
+    if exception is not None:
+        target.set_exception(exception)
+    else:
+        target.set_result(source.result())
+
+def print_timeline(timeline, wall_time, width=40):
+    """Print per-stage spans and the time saved by running stages concurrently"""
+    print("\n" + "="*60)
+    print("⏱️ STAGE TIMELINE")
+    print("="*60)
+
+    stages = {}
+    for stage, start, end in timeline:
+        first, last, busy, tasks = stages.get(stage, (start, end, 0.0, 0))
+        stages[stage] = (min(first, start), max(last, end), busy + (end - start), tasks + 1)
+
+    scale = width / wall_time if wall_time > 0 else 0
+    print(f"\n{'Stage':<18} {'Tasks':>6} {'Start':>8} {'End':>8} {'Busy':>8}")
+    print("-" * (52 + width))
+    for stage, (first, last, busy, tasks) in sorted(stages.items(), key=lambda item: item[1][0]):
+        bar = ' ' * int(first * scale) + '█' * max(1, int((last - first) * scale))
+        print(f"{stage:<18} {tasks:>6} {first:>7.2f}s {last:>7.2f}s {busy:>7.2f}s  {bar}")
+
+    sequential = sum(busy for _, _, busy, _ in stages.values())
+    print(f"\n  Wall-clock: {wall_time:.2f}s | Sequential estimate: {sequential:.2f}s"
+          f" | Saved: {max(sequential - wall_time, 0):.2f}s")
@@ -0,0 +1,556 @@
+import contextlib
+import csv
+import json
+import os
+import queue
+import shutil
+import threading
+import numpy as np
+from plg_metadata import metadata_rows
+from plg_trace import column_bytes, span, tracing
+
+# Load order respects the foreign keys on dim_users
+TABLES = ['dim_users', 'fact_user_events', 'fact_ab_tests', 'fact_cohort_data']
+
+# Staged files use MySQL's default LOAD DATA text format
+NULL_TEXT = '\\N'
+MANIFEST_FILE = 'manifest.json'
+
+# Schema for the embedded backends (mirrors Database Setup.sql)
+EMBEDDED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dim_users (
+    user_id INTEGER PRIMARY KEY,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    company_name VARCHAR(255),
+    user_segment VARCHAR(50),
+    signup_date DATE NOT NULL,
+    country VARCHAR(100),
+    device_type VARCHAR(50),
+    platform VARCHAR(50),
+    industry VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_signup_date ON dim_users (signup_date);
+
+CREATE TABLE IF NOT EXISTS dim_event_metadata (
+    metadata_id SMALLINT PRIMARY KEY,
+    source VARCHAR(50),
+    plan VARCHAR(50),
+    event VARCHAR(100),
+    feature VARCHAR(100),
+    pql_reason VARCHAR(100),
+    payment_method VARCHAR(50),
+    metadata VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS fact_user_events (
+    event_id INTEGER PRIMARY KEY {event_id_default},
+    user_id INTEGER NOT NULL REFERENCES dim_users(user_id),
+    event_type VARCHAR(100),
+    event_timestamp TIMESTAMP NOT NULL,
+    event_value DECIMAL(10, 2),
+    metadata_id SMALLINT REFERENCES dim_event_metadata(metadata_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_event ON fact_user_events (user_id, event_timestamp);
+
+CREATE TABLE IF NOT EXISTS fact_ab_tests (
+    ab_test_id INTEGER PRIMARY KEY {ab_test_id_default},
+    user_id INTEGER NOT NULL REFERENCES dim_users(user_id),
+    test_name VARCHAR(100),
+    variant VARCHAR(50),
+    test_start_date DATE NOT NULL,
+    test_end_date DATE,
+    converted BOOLEAN DEFAULT FALSE,
+    conversion_timestamp TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_test ON fact_ab_tests (user_id, test_name);
+
+CREATE TABLE IF NOT EXISTS fact_cohort_data (
+    cohort_id INTEGER PRIMARY KEY {cohort_id_default},
+    user_id INTEGER NOT NULL REFERENCES dim_users(user_id),
+    cohort_date DATE,
+    signup_date DATE,
+    activation_date DATE,
+    feature_adoption_date DATE,
+    pql_date DATE,
+    payment_date DATE,
+    days_to_activation INTEGER,
+    days_to_pql INTEGER,
+    days_to_payment INTEGER
+);
+"""
+
+# Auto-increment keys that the generator leaves to the database
+AUTO_KEYS = {
+    'fact_user_events': 'event_id',
+    'fact_ab_tests': 'ab_test_id',
+    'fact_cohort_data': 'cohort_id',
+}
+
+def column_values(column):
+    """Python values for a column array (NaT -> None)"""
+    return np.asarray(column).tolist()
+
+def column_text(column):
+    """LOAD DATA text for a column array (NULL -> \\N, escaped strings)"""
+    column = np.asarray(column)
+    if len(column) == 0:
+        return np.array([], dtype=object)
+
+    if column.dtype.kind == 'M':
+        unit = np.datetime_data(column.dtype)[0]
+        text = np.char.replace(np.datetime_as_string(column, unit=unit), 'T', ' ').astype(object)
+        text[np.isnat(column)] = NULL_TEXT
+        return text
+
+    if column.dtype == object:
+        return np.array([NULL_TEXT if value is None else escape_text(str(value)) for value in column],
+                        dtype=object)
+
+    return column.astype(str).astype(object)
+
+def escape_text(value):
+    if '\\' in value or '\t' in value or '\n' in value:
+        value = value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return value
+
+def unescape_text(value):
+    if value == NULL_TEXT:
+        return None
+    if '\\' in value:
+        value = value.replace('\\\\', '\0').replace('\\t', '\t').replace('\\n', '\n').replace('\0', '\\')
+    return value
+
+# ==========================================
+# SINKS
+# ==========================================
+
+class Sink:
+    """Destination for the column batches produced by the generate_* functions"""
+
+    # DB-API connection when the sink is backed by a database
+    connection = None
+
+    def next_user_id(self):
+        """First free user_id, so generated users get explicit keys"""
+        return 1
+
+    def watermark(self):
+        """(max user_id, max signup_date or None) of the users already written"""
+        return 0, None
+
+    def write(self, table, columns):
+        """Write a dict of equal-length column arrays, returns the row count"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Make everything written so far visible in the destination"""
+
+    def close(self):
+        self.flush()
+
+class InsertSink(Sink):
+    """INSERT into a DB-API connection (MySQL by default)
+
+    rows_per_statement=None uses cursor.executemany; otherwise rows are sent
+    as multi-row INSERT ... VALUES (...), (...) statements of that size.
+    Each write() is committed once, not once per batch.
+    """
+
+    placeholder = '%s'
+
+    def __init__(self, connection, batch_size=50000, rows_per_statement=None):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.rows_per_statement = rows_per_statement
+
+    def next_user_id(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM dim_users")
+        first_user_id = int(cursor.fetchone()[0])
+        cursor.close()
+        return first_user_id
+
+    def watermark(self):
+        # Both MAXes are answered from indexes (primary key, idx_signup_date)
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT MAX(user_id), MAX(signup_date) FROM dim_users")
+        max_user_id, max_signup_date = cursor.fetchone()
+        cursor.close()
+        if max_user_id is None:
+            return 0, None
+        return int(max_user_id), np.datetime64(max_signup_date, 'D')
+
+    def write(self, table, columns):
+        names = list(columns)
+        row_placeholders = f"({', '.join([self.placeholder] * len(names))})"
+        query = f"INSERT INTO {table} ({', '.join(names)}) VALUES "
+        rows = list(zip(*(column_values(columns[name]) for name in names)))
+
+        cursor = self.connection.cursor()
+        try:
+            if self.rows_per_statement:
+                for i in range(0, len(rows), self.rows_per_statement):
+                    batch = rows[i:i + self.rows_per_statement]
+                    cursor.execute(query + ', '.join([row_placeholders] * len(batch)),
+                                   [value for row in batch for value in row])
+            else:
+                for i in range(0, len(rows), self.batch_size):
+                    cursor.executemany(query + row_placeholders, rows[i:i + self.batch_size])
+            self.connection.commit()
+        except Exception as e:
+            print(f"   ⚠️ Error writing {table}: {e}")
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        return len(rows)
+
+class EmbeddedSink(InsertSink):
+    """Embedded SQLite/DuckDB database file - no MySQL server needed"""
+
+    placeholder = '?'
+
+    def __init__(self, path, backend='sqlite', batch_size=50000):
+        super().__init__(None, batch_size=batch_size)
+        self.backend = backend
+
+        if backend == 'duckdb':
+            import duckdb
+            self.connection = duckdb.connect(path)
+            for key in AUTO_KEYS.values():
+                self.connection.execute(f"CREATE SEQUENCE IF NOT EXISTS seq_{key}")
+            defaults = {f'{key}_default': f"DEFAULT nextval('seq_{key}')" for key in AUTO_KEYS.values()}
+        else:
+            import sqlite3
+            # The BackgroundWriter thread writes through this connection
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = OFF")
+            defaults = {f'{key}_default': '' for key in AUTO_KEYS.values()}
+
+        cursor = self.connection.cursor()
+        for statement in EMBEDDED_SCHEMA.format(**defaults).split(';'):
+            if statement.strip():
+                cursor.execute(statement)
+        self.connection.commit()
+
+        # The metadata dictionary is fixed: written once per database
+        cursor.execute("SELECT COUNT(*) FROM dim_event_metadata")
+        if not cursor.fetchone()[0]:
+            self.write('dim_event_metadata', metadata_rows())
+
+    def write(self, table, columns):
+        if self.backend != 'duckdb':
+            # sqlite3 stores dates as the same ISO text MySQL prints
+            columns = {name: column_text_values(column) for name, column in columns.items()}
+            return super().write(table, columns)
+
+        # DuckDB ingests a whole DataFrame far faster than row inserts
+        import pandas as pd
+        batch = pd.DataFrame({name: np.asarray(column) for name, column in columns.items()})
+        self.connection.register('generator_batch', batch)
+        names = ', '.join(columns)
+        self.connection.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM generator_batch")
+        self.connection.unregister('generator_batch')
+        return len(batch)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def traced_write(sink, table, columns):
+    """sink.write inside a 'write' span recording rows, bytes and rows/s"""
+    with span('write', table=table) as fields:
+        fields['rows'] = sink.write(table, columns)
+        if tracing():
+            fields['bytes'] = column_bytes(columns)
+    return fields['rows']
+
+class BackgroundWriter(Sink):
+    """Write to another sink from a background thread
+
+    write() hands column batches to a bounded queue and returns at once, so
+    the caller keeps simulating while the previous batches are written; it
+    blocks when max_pending batches are already waiting.
+    """
+
+    def __init__(self, sink, max_pending=4):
+        self.sink = sink
+        self.connection = sink.connection
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='plg-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                # Keep draining after a failure so producers never block
+                if self.error is None:
+                    traced_write(self.sink, *item)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def next_user_id(self):
+        self.flush()
+        return self.sink.next_user_id()
+
+    def watermark(self):
+        self.flush()
+        return self.sink.watermark()
+
+    def write(self, table, columns):
+        self._raise_error()
+        self.queue.put((table, columns))
+        return len(next(iter(columns.values()), []))
+
+    def flush(self):
+        self.queue.join()
+        self._raise_error()
+        self.sink.flush()
+
+    def close(self):
+        """Drain the queue and stop the thread (the wrapped sink stays open)"""
+        try:
+            self.queue.join()
+            self._raise_error()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+
+class SinkPool:
+    """Share sinks between concurrent stage workers, one worker per sink at a time
+
+    With a single sink, writes from all workers are simply serialized.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self.available = queue.Queue()
+        for sink in self.sinks:
+            self.available.put(sink)
+
+    @property
+    def connection(self):
+        return self.sinks[0].connection
+
+    @contextlib.contextmanager
+    def acquire(self):
+        sink = self.available.get()
+        try:
+            yield sink
+        finally:
+            self.available.put(sink)
+
+    def next_user_id(self):
+        return self.sinks[0].next_user_id()
+
+    def watermark(self):
+        return self.sinks[0].watermark()
+
+    def write(self, table, columns):
+        with self.acquire() as sink:
+            return traced_write(sink, table, columns)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+def column_text_values(column):
+    """Like column_values, but dates/timestamps become ISO strings"""
+    column = np.asarray(column)
+    if column.dtype.kind != 'M':
+        return column
+    text = column_text(column)
+    text[text == NULL_TEXT] = None
+    return text
+
+class StagingSink(Sink):
+    """Stage tables as tab-delimited files for LOAD DATA or later re-ingest
+
+    Files are appended per write; manifest.json records column order and
+    row counts so load_staged() can replay the dataset without regenerating.
+    """
+
+    def __init__(self, stage_dir):
+        self.stage_dir = stage_dir
+        os.makedirs(stage_dir, exist_ok=True)
+        self.manifest = read_manifest(stage_dir) or {'tables': {}}
+
+    def next_user_id(self):
+        return self.watermark()[0] + 1
+
+    def watermark(self):
+        watermark = self.manifest.get('watermark')
+        if not watermark:
+            return 0, None
+        return watermark['max_user_id'], np.datetime64(watermark['max_signup_date'], 'D')
+
+    def write(self, table, columns):
+        names = list(columns)
+        entry = self.manifest['tables'].setdefault(table, {'file': f'{table}.tsv', 'columns': names, 'rows': 0})
+        if entry['columns'] != names:
+            raise ValueError(f"{table} columns changed from {entry['columns']} to {names}")
+
+        rows = ['\t'.join(row) for row in zip(*(column_text(columns[name]) for name in names))]
+        with open(os.path.join(self.stage_dir, entry['file']), 'a', encoding='utf-8', newline='\n') as f:
+            if rows:
+                f.write('\n'.join(rows) + '\n')
+
+        entry['rows'] += len(rows)
+        if table == 'dim_users' and rows:
+            self._advance_watermark(columns)
+        return len(rows)
+
+    def _advance_watermark(self, users):
+        max_user_id, max_signup_date = self.watermark()
+        batch_max_date = np.asarray(users['signup_date']).astype('datetime64[D]').max()
+        self.manifest['watermark'] = {
+            'max_user_id': max(max_user_id, int(np.asarray(users['user_id']).astype(np.int64).max())),
+            'max_signup_date': str(batch_max_date if max_signup_date is None else max(max_signup_date, batch_max_date)),
+        }
+
+    def flush(self):
+        write_manifest(self.stage_dir, self.manifest)
+
+class LoadDataSink(StagingSink):
+    """Stage to files, then bulk load them with LOAD DATA LOCAL INFILE
+
+    Each flush loads only the rows staged since the last one: manifest
+    entries record how much of their file MySQL already has, so a later
+    run appending to the same stage_dir never loads a row twice. The
+    connection must be opened with allow_local_infile=True.
+    """
+
+    def __init__(self, connection, stage_dir):
+        super().__init__(stage_dir)
+        self.connection = connection
+        # MySQL is queried once; from then on the watermark advances with the users written
+        max_user_id, max_signup_date = InsertSink.watermark(self)
+        if max_user_id > StagingSink.watermark(self)[0]:
+            self.manifest['watermark'] = {'max_user_id': max_user_id, 'max_signup_date': str(max_signup_date)}
+
+    def flush(self):
+        super().flush()
+        load_data_infile(self.connection, self.stage_dir, self.manifest, tail=True,
+                         checkpoint=lambda: write_manifest(self.stage_dir, self.manifest))
+
+def load_data_infile(connection, stage_dir, manifest, tail=False, checkpoint=None):
+    """LOAD DATA every staged table (in foreign-key order)
+
+    With tail, only the rows past each entry's 'loaded' offset are sent.
+    Every committed load moves the offset to the end of the file and then
+    calls checkpoint(), which should persist the manifest.
+    """
+    cursor = connection.cursor()
+    for table in TABLES:
+        entry = manifest['tables'].get(table)
+        if not entry:
+            continue
+        path = os.path.join(stage_dir, entry['file'])
+        loaded = entry.get('loaded') if tail else None
+        loaded = loaded or {'rows': 0, 'bytes': 0}
+        rows, size = entry['rows'] - loaded['rows'], os.path.getsize(path)
+        if not rows:
+            continue
+
+        load_path = path
+        if loaded['bytes']:
+            # LOAD DATA can't start mid-file: copy the unloaded rows out
+            load_path = path + '.tail'
+            with open(path, 'rb') as source, open(load_path, 'wb') as target:
+                source.seek(loaded['bytes'])
+                shutil.copyfileobj(source, target)
+        infile = os.path.abspath(load_path).replace('\\', '/')
+        try:
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE '{infile}' INTO TABLE {table}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                ({', '.join(entry['columns'])})
+            """)
+            connection.commit()
+        finally:
+            if load_path != path:
+                os.remove(load_path)
+        entry['loaded'] = {'rows': entry['rows'], 'bytes': size}
+        if checkpoint is not None:
+            checkpoint()
+        print(f"   Loaded {rows:,} {table} rows from {entry['file']}")
+    cursor.close()
+
+def read_manifest(stage_dir):
+    path = os.path.join(stage_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def write_manifest(stage_dir, manifest):
+    with open(os.path.join(stage_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+def read_staged(stage_dir, table, entry, batch_size=50000):
+    """Yield column batches (as text values) from a staged table file"""
+    with open(os.path.join(stage_dir, entry['file']), encoding='utf-8', newline='\n') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE, lineterminator='\n')
+        batch = []
+        for row in reader:
+            batch.append([unescape_text(value) for value in row])
+            if len(batch) >= batch_size:
+                yield dict(zip(entry['columns'], (np.array(values, dtype=object) for values in zip(*batch))))
+                batch = []
+        if batch:
+            yield dict(zip(entry['columns'], (np.array(values, dtype=object) for values in zip(*batch))))
+
+def load_staged(sink, stage_dir):
+    """Re-ingest a previously staged dataset into any sink without regenerating it
+
+    A LoadDataSink resumes from the manifest's 'loaded' offsets: rows an
+    earlier loaddata run or --load-only already sent to MySQL are skipped.
+    """
+    manifest = read_manifest(stage_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No {MANIFEST_FILE} in {stage_dir}")
+
+    if isinstance(sink, LoadDataSink):
+        # Files are already in LOAD DATA format - hand them straight to MySQL
+        load_data_infile(sink.connection, stage_dir, manifest, tail=True,
+                         checkpoint=lambda: write_manifest(stage_dir, manifest))
+        if os.path.abspath(stage_dir) == os.path.abspath(sink.stage_dir):
+            # Every row is in MySQL now - the sink's own flush must not load them again
+            sink.manifest = manifest
+        return
+
+    for table in TABLES:
+        entry = manifest['tables'].get(table)
+        if not entry:
+            continue
+        count = sum(sink.write(table, columns) for columns in read_staged(stage_dir, table, entry))
+        print(f"   Loaded {count:,} {table} rows from {entry['file']}")
+    sink.flush()
+
+def open_sink(kind, connection=None, path=None, stage_dir=None, batch_size=50000):
+    """Build a sink by name: insert, multirow, loaddata, stage, sqlite, duckdb"""
+    if kind == 'insert':
+        return InsertSink(connection, batch_size=batch_size)
+    if kind == 'multirow':
+        return InsertSink(connection, rows_per_statement=1000)
+    if kind == 'loaddata':
+        return LoadDataSink(connection, stage_dir)
+    if kind == 'stage':
+        return StagingSink(stage_dir)
+    if kind in ('sqlite', 'duckdb'):
+        return EmbeddedSink(path, backend=kind, batch_size=batch_size)
+    raise ValueError(f"Unknown sink: {kind}")
@@ -0,0 +1,140 @@
+import importlib.util
+import json
+import os
+import pandas as pd
+from plg_db import source_identity
+from plg_trace import span
+
+SNAPSHOT_DIR = 'plg_snapshot'
+MANIFEST_FILE = 'manifest.json'
+
+# Auto-increment primary keys - rows only ever get appended past MAX(key)
+PRIMARY_KEYS = {
+    'dim_users': 'user_id',
+    'fact_user_events': 'event_id',
+    'fact_ab_tests': 'ab_test_id',
+    'fact_cohort_data': 'cohort_id',
+}
+
+def table_fingerprint(connection, table):
+    """Row count and max primary key: cheap to query, changes on every append"""
+    with span('fingerprint', table=table):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*), MAX({PRIMARY_KEYS[table]}) FROM {table}")
+        rows, max_key = cursor.fetchone()
+        cursor.close()
+    return {'rows': int(rows), 'max_key': None if max_key is None else int(max_key)}
+
+def write_arrow(df, path):
+    """Write a DataFrame as an uncompressed (memory-mappable) Feather v2 file"""
+    import pyarrow.feather
+    # Write to a temp file first so an interrupted run never leaves a torn file
+    pyarrow.feather.write_feather(df.reset_index(drop=True), path + '.tmp', compression='uncompressed')
+    os.replace(path + '.tmp', path)
+
+def read_arrow(path, columns=None):
+    """Memory-map a Feather file and read only the requested columns"""
+    import pyarrow.feather
+    return pyarrow.feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+def publish_tables(dfs, publish_dir):
+    """Write each DataFrame in dfs to publish_dir for worker processes to map"""
+    for name, df in dfs.items():
+        if isinstance(df, pd.DataFrame):
+            write_arrow(df, os.path.join(publish_dir, f"{name}.arrow"))
+
+def read_published(publish_dir, columns):
+    """dfs-style dict of the published tables, limited to {name: columns}"""
+    return {name: read_arrow(os.path.join(publish_dir, f"{name}.arrow"), table_columns)
+            for name, table_columns in columns.items()}
+
+def append_rows(cached, delta):
+    """Concatenate frames, keeping categorical columns categorical"""
+    combined = pd.concat([cached, delta], ignore_index=True)
+    for column in cached.columns:
+        if isinstance(cached[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype('category')
+    return combined
+
+class SnapshotCache:
+    """Local Arrow (Feather v2) snapshots of the EDA input tables
+
+    Each DataFrame is stored uncompressed so it can be memory-mapped, along
+    with the database it came from (plg_db.source_identity) and the
+    fingerprint of the table. On load:
+      - another database: re-read the whole table
+      - same fingerprint and columns: read from disk, MySQL is not queried
+      - rows appended past the cached max key: fetch only those and extend
+      - anything else (deletes, new columns): re-read the whole table
+    """
+
+    def __init__(self, cache_dir=SNAPSHOT_DIR):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("pyarrow is required for the snapshot cache")
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.arrow")
+
+    def load(self, connection, name, table, columns, read_table):
+        """Return (df, status) for the columns of a table
+
+        read_table(columns, where) must SELECT those columns from MySQL with
+        the optional WHERE clause and return them as a compact DataFrame.
+        Reads stop at the fingerprint's max key, so rows appended meanwhile
+        are left for the next load instead of being cached under it.
+        """
+        source = source_identity(connection)
+        fingerprint = table_fingerprint(connection, table)
+        entry = self.manifest.get(name)
+        if entry is not None and entry.get('source') != source:
+            entry = None
+        cached = entry is not None and entry['table'] == table and os.path.exists(self.path(name)) \
+            and set(columns) <= set(entry['columns'])
+        key = PRIMARY_KEYS[table]
+        upto = f"{key} <= {fingerprint['max_key']}"
+
+        if cached and fingerprint == entry['fingerprint']:
+            return self.read(name, columns), 'cache hit'
+
+        old = entry['fingerprint'] if cached else None
+        if cached and old['max_key'] is not None and fingerprint['rows'] > old['rows'] \
+                and fingerprint['max_key'] > old['max_key']:
+            delta = read_table(entry['columns'], f"WHERE {key} > {old['max_key']} AND {upto}")
+            # Append-only iff every new row sits past the old max key
+            if len(delta) == fingerprint['rows'] - old['rows']:
+                df = append_rows(self.read(name, entry['columns']), delta)
+                self.write(name, table, df, source, fingerprint)
+                return df[columns], f"extended +{len(delta):,} rows"
+
+        # Keep previously cached columns so other analyses still hit the cache
+        all_columns = columns + [column for column in (entry['columns'] if entry else []) if column not in columns]
+        df = read_table(all_columns, f"WHERE {upto}" if fingerprint['max_key'] is not None else '')
+        self.write(name, table, df, source, fingerprint)
+        return df[columns], 'full read'
+
+    def read(self, name, columns):
+        return read_arrow(self.path(name), columns)
+
+    def write(self, name, table, df, source, fingerprint):
+        write_arrow(df, self.path(name))
+        self.manifest[name] = {'table': table, 'source': source, 'columns': list(df.columns),
+                               'fingerprint': fingerprint}
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def clear(self):
+        """Drop every snapshot so the next load re-reads MySQL"""
+        for name in self.manifest:
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
@@ -0,0 +1,212 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import resource
+import threading
+import time
+import tracemalloc
+
+# Spans are only recorded between start_tracing() and write_trace(); otherwise
+# span() costs one global lookup
+_tracer = None
+
+class Tracer:
+    """Nested timing spans, exported as Chrome trace events
+
+    Every span records its wall time, the process RSS and peak RSS when it
+    ended and any fields the caller adds (rows, bytes, table...). With
+    memory=True, spans on the main thread also record the peak of Python
+    allocations (tracemalloc) while they were open, including nested spans.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        if memory:
+            tracemalloc.start()
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def timestamp(self, moment):
+        return round((moment - self.origin) * 1e6, 1)
+
+    @contextlib.contextmanager
+    def span(self, name, fields):
+        stack = self.stack()
+        # tracemalloc's peak is process-wide: only the main thread resets it
+        track_memory = self.memory and threading.current_thread() is threading.main_thread()
+        entry = {'peak': 0, 'traced': 0}
+        if track_memory:
+            traced, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            entry['traced'] = traced
+        stack.append(entry)
+
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            seconds = end - start
+            if 'rows' in fields and seconds > 0:
+                fields['rows_per_s'] = round(fields['rows'] / seconds)
+            fields['rss_mb'] = round(current_rss() / 1e6, 1)
+            fields['peak_rss_mb'] = round(peak_rss() / 1e6, 1)
+            if track_memory:
+                peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                fields['alloc_peak_mb'] = round((peak - entry['traced']) / 1e6, 2)
+            self.add(name, start, end, fields)
+
+    def add(self, name, start, end, fields):
+        event = {'name': name, 'cat': name.split(':')[0], 'ph': 'X', 'ts': self.timestamp(start),
+                 'dur': round((end - start) * 1e6, 1), 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'args': fields}
+        counter = {'name': 'memory', 'ph': 'C', 'ts': self.timestamp(end), 'pid': os.getpid(),
+                   'args': {'rss_mb': fields['rss_mb']}}
+        with self.lock:
+            self.events += [event, counter]
+
+    def trace_events(self):
+        """Spans and memory counters plus thread names, in Chrome trace event format"""
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                  'args': {'name': threads.get(tid, f"thread-{tid}")}}
+                 for tid in sorted({event['tid'] for event in self.events if 'tid' in event})]
+        return names + sorted(self.events, key=lambda event: event['ts'])
+
+def current_rss():
+    """Resident set size of this process in bytes (falls back to the peak off Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+def peak_rss():
+    """Peak resident set size of this process in bytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def start_tracing(memory=False):
+    global _tracer
+    _tracer = Tracer(memory)
+
+def tracing():
+    return _tracer is not None
+
+def span(name, **fields):
+    """Context manager timing a stage; yields a dict the caller can add fields to
+
+        with span('load_table', table=name) as fields:
+            fields['rows'] = len(df)
+    """
+    if _tracer is None:
+        return contextlib.nullcontext(fields)
+    return _tracer.span(name, fields)
+
+def traced(function):
+    """Decorator: run the function inside a span named after it"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+def read_sql(query, connection, chunksize=None):
+    """pd.read_sql with a span per database call: rows, bytes fetched and rows/s
+
+    Bytes are the fetched frame's in-memory size, a close proxy for what
+    the driver transferred. With chunksize, each chunk gets its own span.
+    """
+    import pandas as pd
+    if chunksize is not None:
+        return _read_sql_chunks(query, connection, chunksize)
+    with span('read_sql', query=query) as fields:
+        df = pd.read_sql(query, connection)
+        if tracing():
+            fields.update(rows=len(df), bytes=int(df.memory_usage(deep=True).sum()))
+    return df
+
+def _read_sql_chunks(query, connection, chunksize):
+    import pandas as pd
+    chunks = iter(pd.read_sql(query, connection, chunksize=chunksize))
+    while True:
+        with span('read_sql', query=query, chunksize=chunksize) as fields:
+            chunk = next(chunks, None)
+            if chunk is not None and tracing():
+                fields.update(rows=len(chunk), bytes=int(chunk.memory_usage(deep=True).sum()))
+        if chunk is None:
+            return
+        yield chunk
+
+def column_bytes(columns):
+    """Approximate size of a batch of column arrays (string lengths for text columns)"""
+    import numpy as np
+    total = 0
+    for column in columns.values():
+        column = np.asarray(column)
+        if column.dtype == object:
+            total += sum(len(value) for value in column if isinstance(value, str))
+        else:
+            total += column.nbytes
+    return total
+
+def write_trace(path):
+    """Write the recorded spans as a Chrome trace (chrome://tracing, Perfetto, speedscope)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': _tracer.trace_events(), 'displayTimeUnit': 'ms'}, f)
+
+def print_trace_summary(top=15):
+    """Per span name: calls, total time, rows/s and the largest memory peaks"""
+    stages = {}
+    for event in _tracer.events:
+        if event['ph'] != 'X':
+            continue
+        stage = stages.setdefault(event['name'], {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0,
+                                                  'rss': 0.0, 'alloc': None})
+        fields = event['args']
+        stage['calls'] += 1
+        stage['seconds'] += event['dur'] / 1e6
+        stage['rows'] += fields.get('rows', 0)
+        stage['bytes'] += fields.get('bytes', 0)
+        stage['rss'] = max(stage['rss'], fields['rss_mb'])
+        if 'alloc_peak_mb' in fields:
+            stage['alloc'] = max(stage['alloc'] or 0, fields['alloc_peak_mb'])
+
+    print(f"\n🧭 TRACE SUMMARY (top {top} spans by total time, peak RSS {peak_rss() / 1e6:.1f}MB):")
+    print(f"  {'Span':<28} {'Calls':>6} {'Seconds':>9} {'Rows/s':>12} {'MB':>9} {'RSS MB':>8} {'Alloc MB':>9}")
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]['seconds'])[:top]:
+        rate = f"{stage['rows'] / stage['seconds']:,.0f}" if stage['rows'] and stage['seconds'] else '-'
+        transferred = f"{stage['bytes'] / 1e6:.2f}" if stage['bytes'] else '-'
+        alloc = '-' if stage['alloc'] is None else f"{stage['alloc']:.2f}"
+        print(f"  {name[:28]:<28} {stage['calls']:>6,} {stage['seconds']:>9.3f} {rate:>12} {transferred:>9} "
+              f"{stage['rss']:>8.1f} {alloc:>9}")
+
+@contextlib.contextmanager
+def profiled(path, top=20):
+    """Run the block under cProfile when path is set: dump pstats there, print the top functions"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"\n🔬 cProfile saved to: {path} (top {top} by cumulative time)")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
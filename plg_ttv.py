@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from plg_cohorts import cohort_start
+
+# Journey steps as (label, from milestone column, to milestone column) of fact_cohort_data
+TTV_TRANSITIONS = [
+    ('Signup to Activation', 'signup_date', 'activation_date'),
+    ('Activation to PQL', 'activation_date', 'pql_date'),
+    ('PQL to Paid', 'pql_date', 'payment_date')
+]
+TTV_QUANTILES = [0.5, 0.9, 0.99]
+TTV_KEYS = ['transition', 'cohort_date', 'user_segment']
+
+# Relative accuracy of QuantileSketch: estimates are within 1% of the exact quantile
+SKETCH_ACCURACY = 0.01
+# Sketch values at or below this count as 0 (a TTV of 0 days is common)
+SKETCH_MIN_VALUE = 1e-9
+# Rows added to a QuantileSketch before they are compacted into its bucket counts
+SKETCH_BUFFER_ROWS = 1_000_000
+
+def quantile_columns(quantiles):
+    return [f"p{q * 100:g}" for q in quantiles]
+
+def ttv_days(milestones):
+    """Days each user took per transition, one row per (user, completed transition)
+
+    milestones has the fact_cohort_data date columns (user_milestones) plus
+    user_segment; users who never completed a transition have no row for it.
+    """
+    labels = [label for label, _, _ in TTV_TRANSITIONS]
+    frames = []
+    for index, (_, start, end) in enumerate(TTV_TRANSITIONS):
+        done = milestones[start].notna() & milestones[end].notna()
+        selected = milestones[done]
+        frames.append(pd.DataFrame({
+            # Categorical, so groupings list the steps in journey order
+            'transition': pd.Categorical.from_codes(np.full(len(selected), index), categories=labels),
+            'signup_date': selected['signup_date'].to_numpy(),
+            'user_segment': selected['user_segment'].to_numpy(),
+            'days': (pd.to_datetime(selected[end]) - pd.to_datetime(selected[start])).dt.days.to_numpy(np.int64)
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def ttv_counts(milestones, granularity='week'):
+    """Users per (transition, cohort, segment, days) - a histogram exact quantiles are read from
+
+    Days are whole numbers, so the histogram is small whatever the number of
+    users, and histograms of partitions (or of appended users) are merged by
+    summing users per key.
+    """
+    days = ttv_days(milestones)
+    days['cohort_date'] = cohort_start(days.pop('signup_date'), granularity)
+    counts = days.groupby(TTV_KEYS + ['days'], observed=True, dropna=False).size()
+    return counts.rename('users').reset_index()
+
+def grouped_quantiles(frame, keys, value='days', weight=None, quantiles=TTV_QUANTILES, method='linear'):
+    """Exact quantiles of value per group of keys, for every group at once
+
+    Rows are observations, or distinct values with a weight column (a
+    histogram) - read without expanding it. method='linear' matches
+    np.quantile's default; 'lower' returns the observation at rank
+    floor(q * (n - 1)). Also returns users, mean, min and max per group.
+    """
+    frame = frame[frame[value].notna()]
+    grouped = frame.groupby(keys, sort=True, observed=True, dropna=False)
+    groups = grouped.ngroup().to_numpy()
+    values = frame[value].to_numpy(float)
+    weights = np.ones(len(frame), np.int64) if weight is None else frame[weight].to_numpy(np.int64)
+
+    order = np.lexsort((values, groups))
+    groups, values, weights = groups[order], values[order], weights[order]
+    sizes = np.bincount(groups, weights=weights, minlength=grouped.ngroups).astype(np.int64)
+    cumulative = np.cumsum(weights)
+    first = np.searchsorted(groups, np.arange(grouped.ngroups))
+    starts = cumulative[first] - weights[first]
+
+    def at_rank(rank):
+        """Value of the observation at a 0-based rank within each group"""
+        return values[np.searchsorted(cumulative, starts + rank, side='right')]
+
+    result = pd.DataFrame({'users': sizes}, index=grouped.size().index)
+    result['mean'] = np.bincount(groups, weights=values * weights, minlength=grouped.ngroups) / sizes
+    result['min'] = at_rank(0)
+    for q, column in zip(quantiles, quantile_columns(quantiles)):
+        rank = q * (sizes - 1)
+        lower = np.floor(rank).astype(np.int64)
+        if method == 'lower':
+            result[column] = at_rank(lower)
+        else:
+            low, high = at_rank(lower), at_rank(np.minimum(lower + 1, sizes - 1))
+            result[column] = low + (rank - lower) * (high - low)
+    result['max'] = at_rank(sizes - 1)
+    return result
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a relative-error guarantee (DDSketch), for many groups
+
+    Values are counted in logarithmic buckets: bucket i holds
+    (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a) for relative
+    accuracy a, and is read back as 2 gamma^i / (gamma + 1). Error bound:
+    every quantile returned is within a relative error of a of the exact
+    observation at the same rank (grouped_quantiles method='lower'), for
+    any distribution and any number of rows. Values at or below
+    SKETCH_MIN_VALUE are counted exactly as 0.
+
+    Size is buckets, not rows: about log(max / min) / (2a) per group, so
+    a = 1% covers 1 to 1,000 days in ~350 buckets. Merging adds bucket
+    counts, so sketches of partitions or of streamed batches merge into
+    exactly the sketch of all the rows - unlike t-digest/KLL, whose
+    merges add error and whose bounds are on rank rather than value.
+    """
+
+    def __init__(self, keys, relative_accuracy=SKETCH_ACCURACY):
+        self.keys = list(keys)
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._counts = None  # keys + bucket + users
+        self._pending = []
+        self._pending_rows = 0
+
+    def buckets(self, values):
+        values = np.asarray(values, dtype=float)
+        buckets = np.zeros(len(values), dtype=np.int64)
+        positive = values > SKETCH_MIN_VALUE
+        buckets[positive] = np.ceil(np.log(values[positive]) / np.log(self.gamma)).astype(np.int64) + 1
+        return buckets  # 0 is the zero bucket; bucket i > 0 is gamma exponent i - 1
+
+    def bucket_values(self, buckets):
+        exponents = np.asarray(buckets) - 1
+        return np.where(buckets > 0, 2 * self.gamma ** exponents.astype(float) / (self.gamma + 1), 0.0)
+
+    def add(self, frame, value='days', weight=None):
+        """Count the rows of frame (keys + value, optionally a weight column)"""
+        frame = frame[frame[value].notna()]
+        batch = frame[self.keys].copy()
+        batch['bucket'] = self.buckets(frame[value].to_numpy())
+        batch['users'] = 1 if weight is None else frame[weight].to_numpy(np.int64)
+        self._buffer(batch)
+        return self
+
+    def merge(self, other):
+        """Add another sketch's counts (same keys and accuracy) into this one"""
+        if other.relative_accuracy != self.relative_accuracy or other.keys != self.keys:
+            raise ValueError("Only sketches with the same keys and accuracy can be merged")
+        if other.counts is not None:
+            self._buffer(other.counts)
+        return self
+
+    def _buffer(self, counts):
+        # Batches are summed into the bucket counts together, not one groupby per add/merge
+        self._pending.append(counts)
+        self._pending_rows += len(counts)
+        if self._pending_rows > SKETCH_BUFFER_ROWS:
+            self._compact()
+
+    def _compact(self):
+        frames = self._pending if self._counts is None else [self._counts] + self._pending
+        grouped = pd.concat(frames, ignore_index=True).groupby(self.keys + ['bucket'], observed=True, dropna=False)
+        self._counts = grouped['users'].sum().reset_index()
+        self._pending, self._pending_rows = [], 0
+
+    @property
+    def counts(self):
+        """Users per (keys, bucket), or None while nothing was added"""
+        if self._pending:
+            self._compact()
+        return self._counts
+
+    def quantiles(self, quantiles=TTV_QUANTILES, by=None):
+        """Estimated quantiles per group of `by` (default: the sketch keys), with their error bounds
+
+        Coarser groups are read by merging the finer ones' buckets. Each
+        pXX_error is the largest possible absolute error of pXX.
+        """
+        by = self.keys if by is None else list(by)
+        counts = self.counts.groupby(by + ['bucket'], observed=True, dropna=False)['users'].sum().reset_index()
+        counts['value'] = self.bucket_values(counts['bucket'].to_numpy())
+        result = grouped_quantiles(counts, by, 'value', 'users', quantiles, method='lower')
+        result = result[['users'] + quantile_columns(quantiles)]
+        for column in quantile_columns(quantiles):
+            result[f"{column}_error"] = result[column] * self.relative_accuracy / (1 - self.relative_accuracy)
+        return result